@@ -5,10 +5,21 @@ Created on Apr 2022
 """
 
 import time
-from utils import *
+import os
+import sys
+import inspect
+import json
+UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+BASE_DIR = os.path.dirname(UTILS_DIR)
+sys.path.append(BASE_DIR)
+from edge_preservation_similarity.utils import *
 import networkx as nx
 import pandas as pd
-from compute_eps import compute_similarity
+from edge_preservation_similarity.compute_eps import ALGORITHMS, compute_similarity_matrix, ResultJournal
+from edge_preservation_similarity.corpus import is_packed_corpus, PackedCorpus
+from edge_preservation_similarity.tiled_matrix import compute_similarity_tiled, tile_size_for_budget
+from edge_preservation_similarity.neighbors import compute_neighbors, write_neighbors
+from edge_preservation_similarity.anytime import compute_similarity_anytime
 
 import argparse
 
@@ -19,26 +30,46 @@ import argparse
 
     required arguments:
             path for output     string containing the path for the location of the output
-            path to trees       string containing one of two options:  
+            path to trees       string containing one of three options:  
                                 - path to .txt file with paths to .gml tree files in each line
                                 - paths to all .gml tree files in a row
+                                - path to a packed corpus file (see corpus.py)
     optional arguments: 
-            --algorithm         possibility to choose version of algorithm, choices: {approx,exact}
-                                (default: approx)
+            --algorithm         possibility to choose version of algorithm, choices: {approx,exact,exact_warm}
+                                (default: approx), exact_warm starts the exact algorithm from the approximation
             --time_limit=       possibility to set time limit in seconds for exact algorithm (default: 0 meaning no time
                                 limit), data type: int
             --normalize         flag to normalize similarity by dividing by max nr. of edges in tree1 and tree2
                                 (default: false, meaning no normalization)
             --both_directions   flag to compute similarity between trees in both directions for more    
                                 precise output (default: false, meaning just one direction)
+            --jobs=             number of worker processes the pairs of trees are distributed to
+                                (default: 1 meaning no parallelization), data type: int
+            --solver            backend of the exact algorithm, choices: {gurobi,highs} (default: gurobi),
+                                highs is the open-source solver bundled with scipy and needs no license
+            --threads=          number of gurobi threads of the whole run, split evenly among the workers
+                                (default: 0 meaning gurobi chooses), data type: int
+            --update            flag to update the result of an earlier run in the output folder: only the pairs with
+                                trees that are new are computed, trees that are no longer given are dropped
+                                (default: false, meaning the full matrix is computed)
+            --no_deduplicate    flag to compute every pair, by default the exact algorithms compute the similarity once for
+                                every pair of classes of isomorphic trees and copy it to all their pairs (the approximation
+                                depends on the numbering of the nodes and is always computed for every pair)
+            --resume            flag to resume an interrupted run from the journal in the output folder, pairs in the
+                                journal are not computed again (default: false, meaning a new journal is started)
+            --output_format     format of the matrices, choices: {csv,npy} (default: csv), npy uses the out-of-core
+                                tiled engine writing float32 .npy files (see tiled_matrix.py, --update is not supported)
+            --memory=           memory budget in MB of one tile of the npy output (default: 1024), data type: int
+            --top-k=            only the k most similar trees of every tree are saved as sparse list of neighbours
+                                instead of the matrices (see neighbors.py), data type: int
+            --min-similarity=   only pairs with at least this similarity are saved as sparse list of neighbours
+                                instead of the matrices, can be combined with --top-k, data type: float
+            --deadline=         global time limit in seconds of the anytime scheduler: the matrix is filled with the
+                                approximation, the remaining time is spent on the exact algorithm for the pairs with the
+                                largest gap to their upper bound (see anytime.py), data type: float
             -h, --help          show this help message and exit'''
 
 
-ALGORITHMS = {
-    "approx": "EDGE-PRESERVATION-SIM-APPROX",
-    "exact": "EDGE-PRESERVATION-SIM-EXACT"
-}
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="CLI for computing the edge preservation similarity of the given trees")
     parser.add_argument("output_path", type=str, help="Path to folder where output should be saved")
@@ -47,16 +78,45 @@ if __name__ == "__main__":
     parser.add_argument("--time_limit", default=0, dest="limit", type=int, help="Set time limit in seconds for exact algorithm (default: 0 meaning no time limit)")
     parser.add_argument("--normalize", action="store_true", help="Normalize similarity by dividing by max nr. of edges in tree1 and tree2 (default: false meaning no normalization)")
     parser.add_argument("--both_directions", action="store_true", help="Compute similarity between trees in both directions for more precise output (default: false meaning just one direction)")
+    parser.add_argument("--jobs", default=1, type=int, help="Number of worker processes the pairs of trees are distributed to (default: 1 meaning no parallelization)")
+    parser.add_argument("--solver", default="gurobi", type=str, choices=EXACT_SOLVERS.keys(), help="Backend of the exact algorithm (default: gurobi)")
+    parser.add_argument("--threads", default=0, type=int, help="Number of gurobi threads of the whole run, split evenly among the workers (default: 0 meaning gurobi chooses)")
+    parser.add_argument("--update", action="store_true", help="Update the result of an earlier run in the output folder, only pairs with new trees are computed (default: false meaning the full matrix is computed)")
+    parser.add_argument("--no_deduplicate", action="store_true", help="Compute every pair instead of one pair per classes of isomorphic trees (default: false meaning the exact algorithms compute isomorphic trees once)")
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted run from the journal in the output folder (default: false meaning a new journal is started)")
+    parser.add_argument("--output_format", default="csv", type=str, choices=["csv", "npy"], help="Format of the matrices, npy uses the out-of-core tiled engine (default: csv)")
+    parser.add_argument("--memory", default=1024, type=int, help="Memory budget in MB of one tile of the npy output (default: 1024)")
+    parser.add_argument("--top-k", "--top_k", default=None, dest="top_k", type=int, help="Save only the k most similar trees of every tree as sparse list of neighbours")
+    parser.add_argument("--min-similarity", "--min_similarity", default=None, dest="min_similarity", type=float, help="Save only pairs with at least this similarity as sparse list of neighbours")
+    parser.add_argument("--deadline", default=None, type=float, help="Global time limit in seconds of the anytime scheduler mixing the approximation and the exact algorithm")
     parsed_args = parser.parse_args()
-
-
-    if parsed_args.algorithm != None:
+    if parsed_args.output_format == "npy" and parsed_args.update:
+        parser.error("--update is not supported with --output_format npy")
+    if parsed_args.top_k is not None and parsed_args.top_k < 1:
+        parser.error("--top-k has to be at least 1")
+    sparse_output = parsed_args.top_k is not None or parsed_args.min_similarity is not None
+    if sparse_output and (parsed_args.update or parsed_args.resume or parsed_args.output_format == "npy"):
+        parser.error("--top-k and --min-similarity can not be combined with --update, --resume or --output_format npy")
+    if parsed_args.deadline is not None and (parsed_args.algorithm is not None or parsed_args.update or parsed_args.resume
+                                             or parsed_args.output_format == "npy" or sparse_output):
+        parser.error("--deadline can not be combined with --algorithm, --update, --resume, --output_format npy, --top-k or --min-similarity")
+
+
+    if parsed_args.deadline is not None:
+        name_of_algorithm = "EDGE-PRESERVATION-SIM-ANYTIME"
+    elif parsed_args.algorithm != None:
         name_of_algorithm = ALGORITHMS[parsed_args.algorithm]
     else:
         name_of_algorithm = "EDGE-PRESERVATION-SIM-APPROX"
 
     #read in trees
-    if len(parsed_args.graphs) == 1:
+    packed_corpus = None
+    if len(parsed_args.graphs) == 1 and is_packed_corpus(parsed_args.graphs[0]):
+        #case where we have a packed corpus, the trees are taken from the memory mapped file
+        packed_corpus = PackedCorpus(parsed_args.graphs[0])
+        graph_coll = packed_corpus.names
+        len_graph_coll = len(packed_corpus)
+    elif len(parsed_args.graphs) == 1:
         #case where we have a file with filepaths to trees as lines
         with open(parsed_args.graphs[0]) as f:
             graph_coll = [line.rstrip() for line in f]
@@ -70,50 +130,100 @@ if __name__ == "__main__":
     print("exact or approximated algorithm: " + name_of_algorithm)
     print("normalize similarity: " + str(parsed_args.normalize))
 
-    
-    similarity_matrix = np.zeros((len_graph_coll,len_graph_coll))
-    duration_matrix = np.zeros((len_graph_coll,len_graph_coll))
+    if parsed_args.output_format == "npy":
+        #the trees of a tile are read when the tile is computed
+        tile_size = tile_size_for_budget(parsed_args.memory * 2**20)
+        compute_similarity_tiled(name_of_algorithm, packed_corpus if packed_corpus is not None else graph_coll, parsed_args.output_path, name_of_algorithm,
+                                 tile_size, parsed_args.limit, parsed_args.normalize, parsed_args.jobs, parsed_args.threads, parsed_args.solver,
+                                 not parsed_args.no_deduplicate, parsed_args.both_directions, parsed_args.resume)
+        with open(parsed_args.output_path + '/trees_' + name_of_algorithm + '.txt', 'w') as f:
+            f.writelines(str(name) + '\n' for name in graph_coll)
+        print("Computation done!")
+        print("Results saved to: " + str(parsed_args.output_path))
+        sys.exit(0)
+
+    #every tree is parsed once, depths are computed when the tree is created
+    if packed_corpus is not None:
+        #the trees are created from the corpus when needed, worker processes map its file instead of receiving the trees
+        tree_coll = packed_corpus
+    else:
+        tree_coll = import_tree_coll(graph_coll)
+
+    if sparse_output:
+        #neighbours are written row by row as soon as a row is complete
+        rows = compute_neighbors(name_of_algorithm, tree_coll, parsed_args.top_k, parsed_args.min_similarity, parsed_args.limit, parsed_args.normalize,
+                                 parsed_args.jobs, parsed_args.threads, parsed_args.solver, not parsed_args.no_deduplicate, parsed_args.both_directions)
+        count = write_neighbors(rows, parsed_args.output_path + '/neighbors_' + name_of_algorithm + '.csv')
+        with open(parsed_args.output_path + '/trees_' + name_of_algorithm + '.txt', 'w') as f:
+            f.writelines(str(name) + '\n' for name in graph_coll)
+        print("Computation done! " + str(count) + " neighbours")
+        print("Results saved to: " + str(parsed_args.output_path))
+        sys.exit(0)
+
+    if parsed_args.deadline is not None:
+        #approximation of all pairs, the exact algorithm for the pairs with the largest gap until the deadline
+        similarity_matrix, duration_matrix, proven_optimal = compute_similarity_anytime(tree_coll, parsed_args.deadline, parsed_args.normalize,
+                                                                                        parsed_args.both_directions, parsed_args.jobs, parsed_args.threads,
+                                                                                        parsed_args.solver, not parsed_args.no_deduplicate)
+        pd.DataFrame(data=similarity_matrix).to_csv(parsed_args.output_path + '/similarity_' + name_of_algorithm + '.csv')
+        pd.DataFrame(data=duration_matrix).to_csv(parsed_args.output_path + '/duration_' + name_of_algorithm + '.csv')
+        pd.DataFrame(data=proven_optimal.astype(int)).to_csv(parsed_args.output_path + '/optimal_' + name_of_algorithm + '.csv')
+        with open(parsed_args.output_path + '/trees_' + name_of_algorithm + '.txt', 'w') as f:
+            f.writelines(str(name) + '\n' for name in graph_coll)
+        print("Computation done! " + str(int(proven_optimal.sum())) + " of " + str(proven_optimal.size) + " similarities proven optimal")
+        print("Results saved to: " + str(parsed_args.output_path))
+        sys.exit(0)
 
-    for i in range(len_graph_coll):
-        for j in range(len_graph_coll):
-            G1=nx.read_gml(graph_coll[i], label="id")
-            G2=nx.read_gml(graph_coll[j], label="id")
     
-            # check whether you are at a position above the diagonal 
-            if i <= j:
-                similarity, duration, _ = compute_similarity(name_of_algorithm, G1, G2, parsed_args.limit, parsed_args.normalize)
-                similarity_matrix[i,j] = similarity
-                duration_matrix[i,j] = duration
-
-                if not parsed_args.both_directions:
-                    #if only one direction is computed the matrix is filled with the mirrored values
-                    similarity_matrix[j,i] = similarity
-                    duration_matrix[j,i] = duration
-                
-
-
-            else:
-                #position below diagonal
-
-                if parsed_args.both_directions:
-                    #if both directions should be computed the maximum of both similarity values is saved
-                    compare_value = similarity_matrix[j,i]
-                    similarity, duration, _ = compute_similarity(name_of_algorithm, G1, G2, parsed_args.limit, parsed_args.normalize)
-
-                    if compare_value < similarity:
-                        similarity_matrix[i,j] = similarity
-                        duration_matrix[i,j] = duration
-                        similarity_matrix[j,i] = similarity
-                        duration_matrix[j,i] = duration
-                    else:
-                        similarity_matrix[i,j] = similarity_matrix[j,i]
-                        duration_matrix[i,j] = duration_matrix[j,i]
+    #settings the values depend on, an update has to use the same settings as the earlier run
+    settings = {'algorithm': name_of_algorithm, 'time_limit': parsed_args.limit, 'normalize': parsed_args.normalize,
+                'both_directions': parsed_args.both_directions, 'solver': parsed_args.solver}
+
+    #directions that are known already, they are not computed again
+    done = {}
+    if parsed_args.update:
+        settings_path = parsed_args.output_path + '/settings_' + name_of_algorithm + '.json'
+        if not os.path.isfile(settings_path):
+            parser.error("--update needs the settings of the earlier run (" + settings_path + ")")
+        with open(settings_path) as f:
+            old_settings = json.load(f)
+        different = sorted(key for key in settings if old_settings.get(key) != settings[key])
+        if different:
+            parser.error("--update has to be run with the settings of the earlier run, different: " + ", ".join(different))
+        with open(parsed_args.output_path + '/trees_' + name_of_algorithm + '.txt') as f:
+            old_graph_coll = [line.rstrip('\n') for line in f]
+        old_index = {name: k for k, name in enumerate(old_graph_coll)}
+        old_position = np.array([old_index.get(name, -1) for name in graph_coll], dtype=int)
+        known = np.flatnonzero(old_position >= 0)
+        #values of trees that are no longer given are dropped, both directions of a pair of two known trees are known
+        old_similarity_matrix = pd.read_csv(parsed_args.output_path + '/similarity_' + name_of_algorithm + '.csv', index_col=0).to_numpy()
+        old_duration_matrix = pd.read_csv(parsed_args.output_path + '/duration_' + name_of_algorithm + '.csv', index_col=0).to_numpy()
+        for i in known.tolist():
+            for j in known.tolist():
+                done[(i,j)] = (old_similarity_matrix[old_position[i], old_position[j]], old_duration_matrix[old_position[i], old_position[j]], False)
+        print("update of earlier result: " + str(len_graph_coll - len(known)) + " new trees, " + str(len(old_graph_coll) - len(known)) + " removed trees")
+
+    #every result is written to the journal as soon as it is computed, pairs of the journal are skipped when resuming
+    journal_header = dict(settings, trees=graph_coll)
+    with ResultJournal(parsed_args.output_path + '/journal_' + name_of_algorithm + '.csv', journal_header, parsed_args.resume) as journal:
+        if parsed_args.resume:
+            print("resumed journal: " + str(len(journal.results)) + " results")
+        done.update(journal.results)
+        #pairs above (and on) the diagonal are computed and mirrored, with both directions the maximum of both similarity values is saved
+        similarity_matrix, duration_matrix, _ = compute_similarity_matrix(name_of_algorithm, tree_coll, parsed_args.limit, parsed_args.normalize, parsed_args.both_directions,
+                                                                          parsed_args.jobs, parsed_args.threads, parsed_args.solver, not parsed_args.no_deduplicate,
+                                                                          callback=journal.add, done=done)
 
     #parsed_args.output_path
     df_similarity_matrix = pd.DataFrame(data=similarity_matrix)
     df_duration_matrix = pd.DataFrame(data=duration_matrix)
     df_similarity_matrix.to_csv(parsed_args.output_path + '/similarity_' + name_of_algorithm + '.csv')
     df_duration_matrix.to_csv(parsed_args.output_path + '/duration_' + name_of_algorithm + '.csv')
+    #trees of the matrices in their order, needed to update the result later
+    with open(parsed_args.output_path + '/trees_' + name_of_algorithm + '.txt', 'w') as f:
+        f.writelines(str(name) + '\n' for name in graph_coll)
+    with open(parsed_args.output_path + '/settings_' + name_of_algorithm + '.json', 'w') as f:
+        json.dump(settings, f)
 
     print("Computation done!")
     print("Results saved to: " + str(parsed_args.output_path))
@@ -0,0 +1,196 @@
+"""
+Created on Oct 2026
+
+deadline-aware anytime computation of the similarity matrix
+"""
+
+import os
+import sys
+import inspect
+import time
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+BASE_DIR = os.path.dirname(UTILS_DIR)
+sys.path.append(BASE_DIR)
+from edge_preservation_similarity.utils import *
+from edge_preservation_similarity.corpus import PackedCorpus, TreeCache
+
+
+''' The anytime scheduler gives a complete similarity matrix within a global deadline:
+        1. the whole matrix is filled with the approximation
+        2. pairs whose approximation reaches the edge type upper bound (see edge_type_upper_bound) are optimal
+        3. the remaining time is spent on the exact measure for the other pairs, ordered by the gap between their upper
+           bound and their approximation, largest gap first, every solve is started from the mapping of the approximation
+           (computed again for the pair, the mappings of all pairs are not kept)
+    Every exact computation gets the remaining time as time limit and no computation is started after the deadline, so
+    the computation ends at the deadline (plus the time to build the last models). Pairs that were solved within their
+    time limit are optimal.'''
+
+
+#trees and solver of a worker process of compute_similarity_anytime, set once per worker by the pool initializer
+_worker_state = None
+
+def _init_worker(trees, threads=0, solver='gurobi'):
+    global _worker_state
+    if isinstance(trees, PackedCorpus):
+        #the worker maps the corpus itself and creates the trees it needs
+        trees = TreeCache(trees)
+    _worker_state = (trees, solver)
+    if threads > 0 and gu is not None:
+        configure_gurobi(threads)
+
+def _approximate(G1, G2, both_directions):
+    #approximation of G1 to G2, with both directions the better mapping is used (turned around if it maps G2 to G1)
+    ALG = Approx_alg()
+    if both_directions and G1 is not G2:
+        ALG.compute_duos_both(G1,G2)
+        if ALG._best_eval_reverse > ALG._best_eval:
+            #the exact measure is symmetric
+            n1, n2 = G1.order(), G2.order()
+            return ALG._best_eval_reverse, [[v1-n2, v2+n1] for v2, v1 in ALG._sol_reverse]
+    else:
+        ALG.compute_duos(G1,G2)
+    return ALG._best_eval, ALG._sol
+
+def _approximate_pair(pair, both_directions):
+    #approximation of trees[i] to trees[j]
+    trees, _ = _worker_state
+    tic = time.time()
+    similarity, _ = _approximate(trees[pair[0]], trees[pair[1]], both_directions)
+    return similarity, time.time()-tic
+
+def _exact_pair(pair, upper_bound, time_limit, both_directions):
+    #exact measure of trees[i] to trees[j], the approximation is computed again as start instead of keeping the mappings
+    #of all pairs, it takes a small part of the time of the exact measure
+    trees, solver = _worker_state
+    G1, G2 = trees[pair[0]], trees[pair[1]]
+    tic = time.time()
+    _, start = _approximate(G1, G2, both_directions)
+    if time_limit > 0:
+        time_limit = max(time_limit-(time.time()-tic), 1e-3)
+    GU = EXACT_SOLVERS[solver](0)
+    time_limit_exceeded = GU.compute_duos(G1,G2, time_limit, start=start, upper_bound=upper_bound)
+    similarity = Evaluator().evaluate_sol(G1,G2,GU._sol,store_duos=False)
+    return similarity, time.time()-tic, time_limit_exceeded
+
+
+def compute_similarity_anytime(trees, deadline=0, normalize=False, both_directions=False, jobs=1, threads=0, solver='gurobi',
+                               deduplicate=True, callback=None):
+    '''FUNCTION FOR THE ANYTIME COMPUTATION OF THE SIMILARITY MATRIX
+
+        input:  trees:              list of trees as Tree or networkx graph objects or a PackedCorpus
+
+                optional:
+                deadline:           global time limit in seconds for the whole matrix (default: 0 meaning every pair is
+                                    solved exactly), note: the approximation of all pairs is always computed
+                normalize, solver:  see compute_similarity
+                both_directions:    flag, if true the approximation is computed in both directions and the better one is
+                                    used, the exact measure is symmetric and computed in one direction
+                jobs, threads:      see compute_similarity_pairs, one pool of worker processes is used for both phases
+                deduplicate:        flag, if true the exact measure is computed once for every pair of classes of
+                                    isomorphic trees (see canonical_classes)
+                callback:           function called with ((i, j), (similarity, duration, time_limit_exceeded)) for every
+                                    exact computation as soon as it is done
+
+        output: similarity, duration, proven_optimal: numpy arrays of shape (len(trees), len(trees)),
+                proven_optimal is True for every pair whose similarity is optimal'''
+
+    tic = time.time()
+    shared = trees if isinstance(trees, PackedCorpus) else [as_tree(T) for T in trees]
+    trees = list(shared)
+    n = len(trees)
+
+    #upper bounds of all pairs, one row at a time (see edge_type_upper_bounds)
+    histograms = edge_type_histograms(trees)
+    upper_bound_matrix = np.array([edge_type_upper_bounds(histograms, query) for query in histograms.toarray()], dtype=float).reshape(n, n)
+    num_edges = np.array([T.number_of_edges() for T in trees], dtype=float)
+    scale = np.maximum(np.maximum.outer(num_edges, num_edges), 1) if normalize else np.ones((n, n))
+
+    executor = None
+    if jobs > 1:
+        #concurrent solves share the thread budget
+        if threads <= 0:
+            threads = os.cpu_count() or jobs
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(shared, max(1, threads // jobs), solver))
+    else:
+        _init_worker(trees, threads, solver)
+
+    try:
+        #1. approximation of all pairs above (and on) the diagonal, not normalized to compare it with the upper bounds
+        pairs = [(i,j) for i in range(n) for j in range(i, n)]
+        if executor is not None:
+            results = executor.map(_approximate_pair, pairs, itertools.repeat(both_directions), chunksize=max(1, len(pairs) // (4*jobs)))
+        else:
+            results = map(_approximate_pair, pairs, itertools.repeat(both_directions))
+        similarity_matrix = np.zeros((n, n))
+        duration_matrix = np.zeros((n, n))
+        for (i, j), (similarity, duration) in zip(pairs, results):
+            similarity_matrix[i,j] = similarity_matrix[j,i] = similarity
+            duration_matrix[i,j] = duration_matrix[j,i] = duration
+        proven_optimal = similarity_matrix >= upper_bound_matrix
+
+        #2. pairs of the same classes of isomorphic trees have the same optimum, it is computed once for the pair with
+        #   the best approximation, if that one is optimal already all of them are
+        representatives = canonical_classes(trees).tolist() if deduplicate else list(range(n))
+        groups = {}
+        for i, j in pairs:
+            groups.setdefault((min(representatives[i], representatives[j]), max(representatives[i], representatives[j])), []).append((i,j))
+        candidates = []
+        for positions in groups.values():
+            best = max(positions, key=lambda pair: similarity_matrix[pair])
+            if proven_optimal[best]:
+                for i, j in positions:
+                    similarity_matrix[i,j] = similarity_matrix[j,i] = similarity_matrix[best]
+                    proven_optimal[i,j] = proven_optimal[j,i] = True
+            else:
+                candidates.append((best, positions))
+        #largest (normalized) gap first
+        candidates.sort(key=lambda candidate: -(upper_bound_matrix[candidate[0]]-similarity_matrix[candidate[0]]) / scale[candidate[0]])
+
+        def add(best, positions, result):
+            similarity, duration, time_limit_exceeded = result
+            #the result is copied to all pairs of the group like in compute_similarity_pairs, including the duration
+            for i, j in positions:
+                similarity_matrix[i,j] = similarity_matrix[j,i] = max(similarity_matrix[i,j], similarity)
+                proven_optimal[i,j] = proven_optimal[j,i] = not time_limit_exceeded
+                duration_matrix[i,j] += duration
+                if i != j:
+                    duration_matrix[j,i] += duration
+            if callback is not None:
+                callback(best, result)
+
+        def time_limit():
+            #time limit of the next exact computation, None if the deadline has passed
+            if deadline <= 0:
+                return 0
+            remaining = deadline - (time.time()-tic)
+            return remaining if remaining > 0 else None
+
+        #3. exact measure until the deadline, a new pair is started as soon as a worker is free
+        queue = iter(candidates)
+        running = {}
+        while True:
+            while len(running) < max(jobs, 1):
+                limit = time_limit()
+                candidate = next(queue, None) if limit is not None else None
+                if candidate is None:
+                    break
+                best, positions = candidate
+                arguments = (best, int(upper_bound_matrix[best]), limit, both_directions)
+                if executor is None:
+                    add(best, positions, _exact_pair(*arguments))
+                else:
+                    running[executor.submit(_exact_pair, *arguments)] = candidate
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                best, positions = running.pop(future)
+                add(best, positions, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return similarity_matrix / scale, duration_matrix, proven_optimal
@@ -1,11 +1,15 @@
 import time
 import os
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 import sys
 import inspect
 UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 BASE_DIR = os.path.dirname(UTILS_DIR)
 sys.path.append(BASE_DIR)
 from edge_preservation_similarity.utils import *
+from edge_preservation_similarity.corpus import PackedCorpus, TreeCache
 
 
 
@@ -14,39 +18,62 @@ from edge_preservation_similarity.utils import *
     more information in CLI_eps.py or in README on git'''
 
 
+#names of the algorithms in the CLIs
+ALGORITHMS = {
+    "approx": "EDGE-PRESERVATION-SIM-APPROX",
+    "exact": "EDGE-PRESERVATION-SIM-EXACT",
+    "exact_warm": "EDGE-PRESERVATION-SIM-EXACT-WARM"
+}
 
-def compute_similarity(algorithm, G1, G2, time_limit=0, normalize=False):
+
+
+def compute_similarity(algorithm, G1, G2, time_limit=0, normalize=False, verbose=True, solver='gurobi'):
     '''FUNCTION FOR COMPUTATION OF EDGE PRESERVATION SIMILARITY
         computes the given algorithm and returns the edge preservation similarity
 
         input:  algorithm: possibilities    'EDGE-PRESERVATION-SIM-APPROX' for approximation
                                             'EDGE-PRESERVATION-SIM-EXACT' for exact measure
-                G1:                 first tree as networkx graph object
-                G2:                 second tree as networkx graph object
+                                            'EDGE-PRESERVATION-SIM-EXACT-WARM' for exact measure, warm started with the
+                                            approximation and bounded by edge_type_upper_bound
+                G1:                 first tree as Tree or networkx graph object
+                G2:                 second tree as Tree or networkx graph object
                 
                 optional:
-                time_limit:         time limit in seconds, note: only implemented for 'EDGE-PRESERVATION-SIM-EXACT' as it is NP-hard
+                time_limit:         time limit in seconds, note: only implemented for the exact measure as it is NP-hard
                 normalize:          flag, if true results are normalized by division by max(#edges in trees G1 or G2)
+                verbose:            flag, if false the time limit is not printed (e.g. for batch runs)
+                solver:             backend of the exact measure, possibilities: 'gurobi', 'highs' (see EXACT_SOLVERS)
 
         output: edge preservation similarity value'''
 
     E=Evaluator()
 
-    G1 = add_depth(G1)
-    G2 = add_depth(G2)
+    G1 = as_tree(G1)
+    G2 = as_tree(G2)
 
-    if time_limit > 0:
+    if time_limit > 0 and verbose:
         print("time limit: " + str(time_limit))
     time_limit_exceeded = False
 
     tic=time.time()
 
-    timeflag = False
     if algorithm == 'EDGE-PRESERVATION-SIM-EXACT':
-        GU=Gurobi_solver(0)
+        GU=EXACT_SOLVERS[solver](0)
         time_limit_exceeded = GU.compute_duos(G1,G2, time_limit)
         similarity = E.evaluate_sol(G1,G2,GU._sol)
 
+    elif algorithm == 'EDGE-PRESERVATION-SIM-EXACT-WARM':
+        ALG=Approx_alg()
+        ALG.compute_duos(G1,G2)
+        upper_bound = edge_type_upper_bound(G1,G2)
+        if ALG._best_eval >= upper_bound:
+            #the approximation reaches the upper bound and is optimal
+            similarity = E.evaluate_sol(G1,G2,ALG._sol)
+        else:
+            GU=EXACT_SOLVERS[solver](0)
+            time_limit_exceeded = GU.compute_duos(G1,G2, time_limit, start=ALG._sol, upper_bound=upper_bound)
+            similarity = E.evaluate_sol(G1,G2,GU._sol)
+
     elif algorithm == 'EDGE-PRESERVATION-SIM-APPROX':
         ALG=Approx_alg()
         ALG.compute_duos(G1,G2)
@@ -55,11 +82,320 @@ def compute_similarity(algorithm, G1, G2, time_limit=0, normalize=False):
     tac=time.time()
     duration = tac-tic
 
-    if timeflag:
+    if time_limit_exceeded and verbose:
         print("Time limit of " + str(time_limit) + "s exceeded.")
     
             
     if normalize:
         similarity = normalize_similarity(similarity, G1, G2)
 
-    return similarity, duration, time_limit_exceeded
\ No newline at end of file
+    return similarity, duration, time_limit_exceeded
+
+
+def compute_similarity_both(algorithm, G1, G2, time_limit=0, normalize=False, verbose=True, solver='gurobi'):
+    '''computes the edge preservation similarity of G1 to G2 and of G2 to G1 in one combined computation
+        approximation:  the LM-Graph is computed once and transposed for the second direction (see Approx_alg.compute_duos_both)
+        exact measure:  the measure is symmetric, so it is computed once and used for both directions
+
+        input:  see compute_similarity
+        output: (similarity, duration, time_limit_exceeded) of G1 to G2 and of G2 to G1,
+                the duration of the combined computation is split evenly between both directions'''
+
+    G1 = as_tree(G1)
+    G2 = as_tree(G2)
+    if G1 is G2:
+        result = compute_similarity(algorithm, G1, G2, time_limit, normalize, verbose, solver)
+        return result, result
+
+    if algorithm != 'EDGE-PRESERVATION-SIM-APPROX':
+        similarity, duration, time_limit_exceeded = compute_similarity(algorithm, G1, G2, time_limit, normalize, verbose, solver)
+        return (similarity, duration/2, time_limit_exceeded), (similarity, duration/2, time_limit_exceeded)
+
+    E=Evaluator()
+    tic=time.time()
+    ALG=Approx_alg()
+    ALG.compute_duos_both(G1,G2)
+    similarity = E.evaluate_sol(G1,G2,ALG._sol)
+    similarity_reverse = E.evaluate_sol(G2,G1,ALG._sol_reverse)
+    duration = (time.time()-tic)/2
+
+    if normalize:
+        similarity = normalize_similarity(similarity, G1, G2)
+        similarity_reverse = normalize_similarity(similarity_reverse, G2, G1)
+
+    return (similarity, duration, False), (similarity_reverse, duration, False)
+
+
+#trees and settings of a worker process of compute_similarity_pairs, set once per worker by the pool initializer
+_worker_state = None
+
+def _init_worker(algorithm, trees, time_limit, normalize, threads=0, solver='gurobi', both_directions=False):
+    global _worker_state
+    if isinstance(trees, PackedCorpus):
+        #the worker maps the corpus itself and creates the trees it needs
+        trees = TreeCache(trees)
+    _worker_state = (algorithm, trees, time_limit, normalize, solver, both_directions)
+    if gu is not None:
+        #one gurobi environment per worker, the first solve starts it and all later solves reuse it
+        configure_gurobi(threads)
+
+def _compute_pair(pair):
+    algorithm, trees, time_limit, normalize, solver, both_directions = _worker_state
+    if both_directions:
+        return compute_similarity_both(algorithm, trees[pair[0]], trees[pair[1]], time_limit, normalize, verbose=False, solver=solver)
+    return compute_similarity(algorithm, trees[pair[0]], trees[pair[1]], time_limit, normalize, verbose=False, solver=solver)
+
+def _compute_chunk(algorithm, time_limit, normalize, solver, both_directions, tree_pairs):
+    #task of an executor given by the caller, the trees are sent with the task as no initializer is run
+    compute = compute_similarity_both if both_directions else compute_similarity
+    return [compute(algorithm, G1, G2, time_limit, normalize, verbose=False, solver=solver) for G1, G2 in tree_pairs]
+
+
+def compute_similarity_pairs(algorithm, trees, pairs, time_limit=0, normalize=False, jobs=1, threads=0, solver='gurobi', deduplicate=True, both_directions=False, callback=None, executor=None):
+    '''computes the edge preservation similarity for a list of pairs of trees, optionally in parallel
+
+        input:  algorithm:          see compute_similarity
+                trees:              list of trees as Tree or networkx graph objects or a PackedCorpus, the worker
+                                    processes of a corpus map its file instead of receiving the trees
+                pairs:              list of index pairs (i, j), the similarity of trees[i] to trees[j] is computed
+
+                optional:
+                time_limit, normalize, solver: see compute_similarity
+                jobs:               number of worker processes, pairs are distributed in chunks (default: 1 meaning no pool)
+                threads:            number of gurobi threads of the whole run, split evenly among the workers
+                                    (default: 0 meaning gurobi chooses for a single process and one share of all cores per worker)
+                deduplicate:        flag, if true the exact measure is only computed for one representative of every class
+                                    of isomorphic trees (see canonical_classes) and copied to all pairs of the same classes,
+                                    the approximation depends on the numbering of the nodes and is computed for every pair
+                both_directions:    flag, if true the similarity of trees[j] to trees[i] is computed together with every
+                                    pair (see compute_similarity_both)
+                callback:           function called with (pair, result) as soon as the result of a pair is computed,
+                                    e.g. to write it to a ResultJournal
+                executor:           concurrent.futures executor the pairs are submitted to in chunks instead of the
+                                    worker processes of jobs (e.g. a pool shared by several calls)
+
+        output: list of (similarity, duration, time_limit_exceeded) in the order of pairs,
+                list of pairs of these (direction (i, j), direction (j, i)) if both_directions is true'''
+
+    shared = trees
+    if isinstance(trees, PackedCorpus):
+        #only the trees of the pairs are created in this process
+        trees = {i: trees[i] for i in sorted({i for pair in pairs for i in pair})}
+        indices = list(trees)
+    else:
+        trees = [as_tree(T) for T in trees]
+        shared = trees
+        indices = range(len(trees))
+    if time_limit > 0:
+        print("time limit: " + str(time_limit))
+    if not deduplicate or algorithm == 'EDGE-PRESERVATION-SIM-APPROX':
+        results = []
+        for pair, result in zip(pairs, _iter_pairs(algorithm, trees, shared, pairs, time_limit, normalize, jobs, threads, solver, both_directions, callback is not None, executor)):
+            results.append(result)
+            if callback is not None:
+                callback(pair, result)
+        return results
+
+    first = {}
+    representatives = {i: first.setdefault(trees[i].canonical_id(), i) for i in indices}
+    #positions of the pairs of every pair of representatives
+    positions = {}
+    for k, (i, j) in enumerate(pairs):
+        positions.setdefault((representatives[i], representatives[j]), []).append(k)
+    unique_pairs = list(positions)
+    results = [None]*len(pairs)
+    for unique_pair, result in zip(unique_pairs, _iter_pairs(algorithm, trees, shared, unique_pairs, time_limit, normalize, jobs, threads, solver, both_directions, callback is not None, executor)):
+        for k in positions[unique_pair]:
+            results[k] = result
+            if callback is not None:
+                callback(pairs[k], result)
+    return results
+
+def _iter_pairs(algorithm, trees, shared, pairs, time_limit, normalize, jobs, threads, solver, both_directions, stream=False, executor=None):
+    '''yields the results of the pairs in their order
+        trees: trees of the pairs in this process, shared: trees or corpus sent to the worker processes
+        stream: flag, if true results are passed on in small chunks'''
+    global _worker_state
+    if executor is not None:
+        chunksize = 16 if stream else 64
+        futures = [executor.submit(_compute_chunk, algorithm, time_limit, normalize, solver, both_directions,
+                                   [(trees[i], trees[j]) for i, j in pairs[k:k+chunksize]]) for k in range(0, len(pairs), chunksize)]
+        for future in futures:
+            yield from future.result()
+        return
+
+    if jobs <= 1 or len(pairs) <= 1:
+        _worker_state = (algorithm, trees, time_limit, normalize, solver, both_directions)
+        if threads > 0 and gu is not None:
+            #without a thread budget the environment of this process is kept as configured by the caller
+            configure_gurobi(threads)
+        for pair in pairs:
+            yield _compute_pair(pair)
+        return
+
+    #concurrent solves share the thread budget instead of each using all cores
+    if threads <= 0:
+        threads = os.cpu_count() or jobs
+    threads_per_worker = max(1, threads // jobs)
+    #a few chunks per worker balance the load while keeping the scheduling overhead small
+    chunksize = max(1, len(pairs) // (4*jobs))
+    if stream:
+        chunksize = min(chunksize, 16)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(algorithm, shared, time_limit, normalize, threads_per_worker, solver, both_directions)) as executor:
+        yield from executor.map(_compute_pair, pairs, chunksize=chunksize)
+
+
+def _best_direction(result, both_directions):
+    #with both directions the result of the larger similarity is used
+    if not both_directions:
+        return result
+    forward, reverse = result
+    return reverse if forward[0] < reverse[0] else forward
+
+
+def compute_similarity_matrix(algorithm, trees, time_limit=0, normalize=False, both_directions=False, jobs=1, threads=0, solver='gurobi',
+                              deduplicate=True, diagonal=True, callback=None, executor=None, done=None):
+    '''FUNCTION FOR COMPUTATION OF THE SIMILARITY MATRIX OF A COLLECTION OF TREES
+        the similarity of trees[i] to trees[j] is computed for all pairs above (and on) the diagonal and mirrored,
+        the trees are prepared once and all pairs are computed in one batch (see compute_similarity_pairs)
+
+        input:  algorithm:          see compute_similarity
+                trees:              list of trees as Tree or networkx graph objects
+
+                optional:
+                time_limit, normalize, jobs, threads, solver, deduplicate, executor: see compute_similarity_pairs
+                both_directions:    flag, if true the similarity of trees[j] to trees[i] is computed as well and the
+                                    maximum of both similarity values is used
+                diagonal:           flag, if false pairs of a tree with itself are not computed (their entries stay 0)
+                callback:           function called with (pair, result) for every direction as soon as it is computed
+                done:               dictionary (i, j) -> (similarity, duration, time_limit_exceeded) of directions that
+                                    are known already (e.g. from a ResultJournal), they are not computed again
+
+        output: similarity, duration, time_limit_exceeded: numpy arrays of shape (len(trees), len(trees))'''
+
+    n = len(trees)
+    done = {} if done is None else done
+    pairs = [(i,j) for i in range(n) for j in range(i if diagonal else i+1, n)]
+    if both_directions:
+        missing = [(i,j) for i, j in pairs if (i,j) not in done or (j,i) not in done]
+        store = None
+        if callback is not None:
+            def store(pair, result):
+                callback(pair, result[0])
+                if pair[0] != pair[1]:
+                    #a pair of a tree with itself has one direction
+                    callback(pair[::-1], result[1])
+    else:
+        missing = [pair for pair in pairs if pair not in done]
+        store = callback
+    results = compute_similarity_pairs(algorithm, trees, missing, time_limit, normalize, jobs, threads, solver, deduplicate, both_directions, store, executor)
+    computed = dict(zip(missing, results))
+
+    similarity_matrix = np.zeros((n, n))
+    duration_matrix = np.zeros((n, n))
+    time_limit_matrix = np.zeros((n, n), dtype=bool)
+    for i, j in pairs:
+        if (i,j) in computed:
+            result = computed[(i,j)]
+        elif both_directions:
+            result = (done[(i,j)], done[(j,i)])
+        else:
+            result = done[(i,j)]
+        similarity, duration, time_limit_exceeded = _best_direction(result, both_directions)
+        similarity_matrix[i,j] = similarity_matrix[j,i] = similarity
+        duration_matrix[i,j] = duration_matrix[j,i] = duration
+        time_limit_matrix[i,j] = time_limit_matrix[j,i] = time_limit_exceeded
+    return similarity_matrix, duration_matrix, time_limit_matrix
+
+
+def compute_similarity_many_to_many(algorithm, trees_G1, trees_G2, time_limit=0, normalize=False, both_directions=False, jobs=1, threads=0,
+                                    solver='gurobi', deduplicate=True, callback=None, executor=None):
+    '''computes the similarity of every tree of trees_G1 to every tree of trees_G2 in one batch
+
+        input:  see compute_similarity_matrix, callback is called with pairs (i, j) of trees_G1[i] and trees_G2[j]
+        output: similarity, duration, time_limit_exceeded: numpy arrays of shape (len(trees_G1), len(trees_G2))'''
+
+    #both collections are prepared together, the same list is only prepared once
+    offset = 0 if trees_G2 is trees_G1 else len(trees_G1)
+    trees = list(trees_G1) if offset == 0 else list(trees_G1) + list(trees_G2)
+    pairs = [(i, offset+j) for i in range(len(trees_G1)) for j in range(len(trees_G2))]
+    store = None
+    if callback is not None:
+        def store(pair, result):
+            callback((pair[0], pair[1]-offset), result)
+    results = compute_similarity_pairs(algorithm, trees, pairs, time_limit, normalize, jobs, threads, solver, deduplicate, both_directions, store, executor)
+
+    shape = (len(trees_G1), len(trees_G2))
+    similarity_matrix = np.zeros(shape)
+    duration_matrix = np.zeros(shape)
+    time_limit_matrix = np.zeros(shape, dtype=bool)
+    for (i, j), result in zip(pairs, results):
+        similarity_matrix[i,j-offset], duration_matrix[i,j-offset], time_limit_matrix[i,j-offset] = _best_direction(result, both_directions)
+    return similarity_matrix, duration_matrix, time_limit_matrix
+
+
+def compute_similarity_one_to_many(algorithm, G1, trees, time_limit=0, normalize=False, both_directions=False, jobs=1, threads=0,
+                                   solver='gurobi', deduplicate=True, callback=None, executor=None):
+    '''computes the similarity of G1 to every tree of trees in one batch
+
+        input:  see compute_similarity_matrix, callback is called with pairs (0, j)
+        output: similarity, duration, time_limit_exceeded: numpy arrays of length len(trees)'''
+    similarity, duration, time_limit_exceeded = compute_similarity_many_to_many(algorithm, [G1], trees, time_limit, normalize, both_directions, jobs,
+                                                                                threads, solver, deduplicate, callback, executor)
+    return similarity[0], duration[0], time_limit_exceeded[0]
+
+
+class ResultJournal:
+    '''append-only journal of computed pairs, every result is written and flushed as soon as it is added, so an interrupted
+        computation can be resumed from it
+
+        file layout:    first line: '#' followed by the header (json) describing the computation
+                        one line per result: i,j,similarity,duration,time_limit_exceeded
+
+        results:        dictionary (i, j) -> (similarity, duration, time_limit_exceeded) of all results in the journal'''
+
+    def __init__(self, path, header, resume=False):
+        '''input:  path: path of the journal file
+                    header: json serializable description of the computation (e.g. trees and settings)
+                    resume: flag, if true the results of an existing journal with the same header are kept,
+                            otherwise the journal is started anew'''
+        self.path = path
+        self.results = {}
+        header = json.loads(json.dumps(header))
+        if resume and os.path.isfile(path):
+            with open(path, 'rb') as fp:
+                first = fp.readline()
+                if not first.startswith(b'#') or json.loads(first[1:]) != header:
+                    raise ValueError("the journal " + str(path) + " was written for other trees or settings")
+                end = fp.tell()
+                for line in fp:
+                    if not line.endswith(b'\n'):
+                        #a line that was not completely written is dropped
+                        break
+                    i, j, similarity, duration, time_limit_exceeded = line.decode().split(',')
+                    self.results[(int(i), int(j))] = (float(similarity), float(duration), time_limit_exceeded.strip() == 'True')
+                    end += len(line)
+            with open(path, 'r+b') as fp:
+                fp.truncate(end)
+            self._fp = open(path, 'a')
+        else:
+            self._fp = open(path, 'w')
+            self._fp.write('#' + json.dumps(header) + '\n')
+            self._fp.flush()
+
+    def add(self, pair, result):
+        '''writes the result (similarity, duration, time_limit_exceeded) of pair to the journal'''
+        i, j = pair
+        similarity, duration, time_limit_exceeded = result
+        self.results[(int(i), int(j))] = (similarity, duration, time_limit_exceeded)
+        self._fp.write(str(int(i)) + ',' + str(int(j)) + ',' + repr(float(similarity)) + ',' + repr(float(duration)) + ',' + str(bool(time_limit_exceeded)) + '\n')
+        self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
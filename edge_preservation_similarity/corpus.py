@@ -0,0 +1,166 @@
+"""
+Created on Oct 2026
+
+packed binary tree corpora
+"""
+
+import os
+import sys
+import inspect
+import json
+import functools
+import argparse
+import numpy as np
+UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+BASE_DIR = os.path.dirname(UTILS_DIR)
+sys.path.append(BASE_DIR)
+from edge_preservation_similarity.utils import *
+
+
+''' A packed corpus stores a whole tree collection in one binary file that is memory mapped when loading,
+    so no gml file has to be opened or parsed and all processes reading the corpus share the same pages.
+
+    usage: python corpus.py [required arguments]
+
+    required arguments:
+            path for output     path of the packed corpus file that is written
+            path to trees       string containing one of two options:
+                                - path to .txt file with paths to .gml tree files in each line
+                                - paths to all .gml tree files in a row
+
+    file layout:
+            magic bytes         b'EPSCORP1'
+            header length       uint64
+            header              json: label dictionary, tree names and position of every array
+            arrays              (aligned to 64 bytes)
+                                offsets: int64, #trees+1, nodes of tree i are offsets[i]:offsets[i+1]
+                                parents: int32, parent of every node within its tree, -1 for the root
+                                labels:  int32, index of the label of every node in the label dictionary'''
+
+
+MAGIC = b'EPSCORP1'
+_ALIGN = 64
+
+
+def is_packed_corpus(path):
+    '''returns True if path is a file written by pack_corpus'''
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as fp:
+        return fp.read(len(MAGIC)) == MAGIC
+
+
+def pack_corpus(trees, path):
+    '''writes a list of trees (Tree or networkx graph objects) to one packed corpus file'''
+    trees = [as_tree(T) for T in trees]
+    sizes = np.array([T.order() for T in trees], dtype=np.int64)
+    offsets = np.zeros(len(trees)+1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    if trees:
+        parents = np.concatenate([T.parents for T in trees]).astype(np.int32)
+        label_ids, labels = np.unique(np.concatenate([T.labels for T in trees]), return_inverse=True)
+    else:
+        parents = np.zeros(0, dtype=np.int32)
+        label_ids, labels = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+    arrays = [('offsets', offsets), ('parents', parents), ('labels', labels.astype(np.int32))]
+
+    #positions of the arrays relative to the start of the data block
+    positions = {}
+    position = 0
+    for name, array in arrays:
+        positions[name] = [position, array.dtype.str, len(array)]
+        position += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({
+        'labels': [label_name(label_id) for label_id in label_ids.tolist()],
+        'names': [T.name for T in trees],
+        'arrays': positions
+    }).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+    with open(path, 'wb') as fp:
+        fp.write(MAGIC)
+        fp.write(np.uint64(len(header)).tobytes())
+        fp.write(header)
+        for name, array in arrays:
+            fp.write(b'\0' * (data_start + positions[name][0] - fp.tell()))
+            fp.write(array.tobytes())
+
+
+class PackedCorpus:
+    '''memory mapped corpus written by pack_corpus, trees are created on access without parsing
+
+        names:          names of the trees (usually the paths of the packed gml files)
+        label_names:    label dictionary of the corpus'''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fp:
+            if fp.read(len(MAGIC)) != MAGIC:
+                raise ValueError(str(path) + " is not a packed corpus")
+            header_length = int(np.frombuffer(fp.read(8), dtype=np.uint64)[0])
+            header = json.loads(fp.read(header_length).decode())
+        data_start = -(-(len(MAGIC) + 8 + header_length) // _ALIGN) * _ALIGN
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+
+        arrays = {}
+        for name, (position, dtype, length) in header['arrays'].items():
+            arrays[name] = np.frombuffer(data, dtype=np.dtype(dtype), count=length, offset=data_start+position)
+        self._offsets = arrays['offsets']
+        self._parents = arrays['parents']
+        self._labels = arrays['labels']
+        self.names = header['names']
+        self.label_names = header['labels']
+        #label indices of the corpus are translated to the label ids of this process
+        self._label_ids = np.array([intern_label(lbl) for lbl in self.label_names], dtype=np.int32)
+
+    def __reduce__(self):
+        #other processes map the file again instead of receiving a copy of its content
+        return (PackedCorpus, (self.path,))
+
+    def __len__(self):
+        return len(self._offsets)-1
+
+    def __getitem__(self, i):
+        start, end = int(self._offsets[i]), int(self._offsets[i+1])
+        return Tree(self._parents[start:end], self._label_ids[self._labels[start:end]], name=self.names[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def trees(self):
+        '''returns all trees of the corpus as list'''
+        return list(self)
+
+
+class TreeCache:
+    '''trees of a packed corpus created on first access, the recently used trees are kept
+        (e.g. in a worker process that receives the corpus instead of the trees)'''
+
+    def __init__(self, corpus, maxsize=4096):
+        self.corpus = corpus
+        self._get = functools.lru_cache(maxsize=maxsize)(corpus.__getitem__)
+
+    def __len__(self):
+        return len(self.corpus)
+
+    def __getitem__(self, i):
+        return self._get(i)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Packs a collection of gml trees into one binary corpus file")
+    parser.add_argument("output_path", type=str, help="Path of the packed corpus file")
+    parser.add_argument("graphs", type=str, nargs='+', help="Path to a file with trees or paths to files with trees")
+    parsed_args = parser.parse_args()
+
+    if len(parsed_args.graphs) == 1:
+        #case where we have a file with filepaths to trees as lines
+        with open(parsed_args.graphs[0]) as f:
+            graph_coll = [line.rstrip() for line in f]
+    else:
+        #case where we have a list of filepaths to trees
+        graph_coll = parsed_args.graphs
+
+    pack_corpus(import_tree_coll(graph_coll), parsed_args.output_path)
+    print("Packed " + str(len(graph_coll)) + " trees to: " + str(parsed_args.output_path))
@@ -0,0 +1,125 @@
+"""
+Created on Oct 2026
+
+fast reader for the gml files of this project
+"""
+
+import networkx as nx
+
+
+''' The trees of this project are written by parsers.bracket_to_gml, parsers.nx_to_gml or nx.write_gml and always
+    follow the same layout:
+
+        graph [
+          directed 1
+          node [
+            id 0
+            label "0"       (optional)
+            lbl "A"
+          ]
+          edge [
+            source 0
+            target 1
+          ]
+        ]
+
+    parse_gml reads this layout in a single pass over the lines of the file. Files that do not follow it
+    (other keys, nested lists, escaped strings, several keys in one line, ...) are not parsed and the
+    callers fall back to nx.read_gml.'''
+
+
+def _unquote(value):
+    '''returns the content of a quoted gml string, None if it is not a plain quoted string'''
+    if len(value) < 2 or value[0] != '"' or value[-1] != '"':
+        return None
+    value = value[1:-1]
+    if '"' in value or '&' in value:
+        #escaped characters are left to networkx
+        return None
+    return value
+
+
+def parse_gml(path):
+    '''parses a gml file with the layout described above
+        input:  path: path to the gml file
+        output: ids, lbls, labels, sources, targets: lists of node ids, node attributes 'lbl' and 'label' (None if missing)
+                and edge sources and targets, or None if the file does not follow the layout'''
+    ids = []
+    lbls = []
+    labels = []
+    sources = []
+    targets = []
+    directed = False
+    state = 'start'
+    with open(path) as fp:
+        for line in fp:
+            tokens = line.split(None, 1)
+            if not tokens:
+                continue
+            key = tokens[0]
+            value = tokens[1].strip() if len(tokens) > 1 else ''
+            if state == 'graph':
+                if key == 'node' and value == '[':
+                    state = 'node'
+                    node = [None, None, None]
+                elif key == 'edge' and value == '[':
+                    state = 'edge'
+                    edge = [None, None]
+                elif key == 'directed' and value == '1':
+                    directed = True
+                elif key == ']' and not value:
+                    state = 'end'
+                else:
+                    return None
+            elif state == 'node':
+                if key == 'id' and value.lstrip('-').isdigit():
+                    node[0] = int(value)
+                elif key == 'lbl' and _unquote(value) is not None:
+                    node[1] = _unquote(value)
+                elif key == 'label' and _unquote(value) is not None:
+                    node[2] = _unquote(value)
+                elif key == ']' and not value and node[0] is not None and node[1] is not None:
+                    ids.append(node[0])
+                    lbls.append(node[1])
+                    labels.append(node[2])
+                    state = 'graph'
+                else:
+                    return None
+            elif state == 'edge':
+                if key == 'source' and value.lstrip('-').isdigit():
+                    edge[0] = int(value)
+                elif key == 'target' and value.lstrip('-').isdigit():
+                    edge[1] = int(value)
+                elif key == ']' and not value and edge[0] is not None and edge[1] is not None:
+                    sources.append(edge[0])
+                    targets.append(edge[1])
+                    state = 'graph'
+                else:
+                    return None
+            elif state == 'start' and key == 'graph' and value == '[':
+                state = 'graph'
+            else:
+                return None
+    if state != 'end' or not directed or len(set(ids)) != len(ids):
+        return None
+    return ids, lbls, labels, sources, targets
+
+
+def read_gml(path):
+    '''reads a gml tree file, same output as nx.read_gml(path, label='id')
+        the fast parser is used if the file follows the layout of this project, otherwise networkx'''
+    parsed = parse_gml(path)
+    if parsed is None:
+        return nx.read_gml(path, label='id')
+    ids, lbls, labels, sources, targets = parsed
+    node_ids = set(ids)
+    if not all(source in node_ids and target in node_ids for source, target in zip(sources, targets)):
+        return nx.read_gml(path, label='id')
+    G = nx.DiGraph()
+    for node_id, lbl, label in zip(ids, lbls, labels):
+        if label is None:
+            G.add_node(node_id, lbl=lbl)
+        else:
+            G.add_node(node_id, label=label, lbl=lbl)
+    G.add_edges_from(zip(sources, targets))
+    return G
@@ -0,0 +1,210 @@
+"""
+Created on Oct 2026
+
+top-k similarity index for query-by-tree
+"""
+
+import os
+import sys
+import inspect
+import heapq
+import argparse
+import numpy as np
+import scipy.sparse as sp
+import pandas as pd
+UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+BASE_DIR = os.path.dirname(UTILS_DIR)
+sys.path.append(BASE_DIR)
+from edge_preservation_similarity.utils import *
+from edge_preservation_similarity.compute_eps import ALGORITHMS, compute_similarity
+from edge_preservation_similarity.corpus import is_packed_corpus, PackedCorpus
+
+
+''' The index stores the edge type histogram (label of parent, label of child) of every tree of a corpus.
+    A preserved duo maps an edge of the query to an edge of the same type, so the histograms give an upper bound
+    of the similarity of the query to every tree (see edge_type_upper_bound). A query computes the similarity to the
+    trees in the order of their bounds and stops as soon as the k-th best similarity reaches the bound of every
+    remaining tree.
+
+    usage: python index.py build [required arguments]
+           python index.py query [required arguments] [optional arguments]
+
+    build, required arguments:
+            path for index      path of the index file that is written (.npz)
+            path to trees       string containing one of three options:
+                                - path to .txt file with paths to .gml tree files in each line
+                                - paths to all .gml tree files in a row
+                                - path to a packed corpus file (see corpus.py)
+
+    query, required arguments:
+            path of index       path of an index file written by build
+            path to query       path to the .gml file of the query tree
+    query, optional arguments:
+            --k=                number of most similar trees (default: 10), data type: int
+            --algorithm         version of algorithm, choices: {approx,exact,exact_warm} (default: approx)
+            --time_limit=       time limit in seconds for every exact computation (default: 0 meaning no time limit)
+            --normalize         flag to normalize similarity by dividing by max nr. of edges in both trees
+            --solver            backend of the exact algorithm, choices: {gurobi,highs} (default: gurobi)
+            --output=           path of a csv file the result is saved to (default: the result is only printed)'''
+
+
+class SimilarityIndex:
+    '''edge type histograms of the trees of a corpus
+
+        names:          names of the trees, paths of the gml files if the trees are not taken from a packed corpus
+        corpus:         path of the packed corpus of the trees or None
+        num_edges:      number of edges of every tree'''
+
+    def __init__(self, names, label_names, type_parents, type_children, indptr, indices, counts, corpus=None):
+        self.names = list(names)
+        self.label_names = list(label_names)
+        self.corpus = corpus
+        self._type_parents = np.asarray(type_parents, dtype=np.int64)
+        self._type_children = np.asarray(type_children, dtype=np.int64)
+        #rows: trees, columns: edge types of the corpus
+        self._histograms = sp.csr_matrix((np.asarray(counts, dtype=np.int64), np.asarray(indices), np.asarray(indptr)),
+                                         shape=(len(self.names), len(self._type_parents)))
+        self.num_edges = np.asarray(self._histograms.sum(axis=1)).ravel()
+        #edge types encoded with the label ids of this process, as in edge_type_histogram
+        label_ids = np.array([intern_label(lbl) for lbl in self.label_names], dtype=np.int64)
+        types = (label_ids[self._type_parents] << 32) | label_ids[self._type_children]
+        self._type_order = np.argsort(types)
+        self._types = types[self._type_order]
+        self._packed_corpus = None
+
+    @classmethod
+    def build(cls, trees, corpus=None):
+        '''creates the index of a list of trees (Tree or networkx graph objects)
+            corpus: path of the packed corpus the trees are taken from, otherwise the names of the trees have to be
+                    the paths of their gml files (as set by import_tree) to compute similarities later'''
+        trees = [as_tree(T) for T in trees]
+        histograms = [edge_type_histogram(T) for T in trees]
+        if histograms:
+            all_types = np.concatenate([types for types, _ in histograms])
+        else:
+            all_types = np.zeros(0, dtype=np.int64)
+        corpus_types, indices = np.unique(all_types, return_inverse=True)
+        indptr = np.zeros(len(trees)+1, dtype=np.int64)
+        np.cumsum([len(types) for types, _ in histograms], out=indptr[1:])
+        counts = np.concatenate([counts for _, counts in histograms]) if histograms else np.zeros(0, dtype=np.int64)
+
+        #labels are stored by name, label ids are only valid within one process
+        label_ids, label_index = np.unique(np.concatenate((corpus_types >> 32, corpus_types & 0xFFFFFFFF)), return_inverse=True)
+        label_names = [label_name(label_id) for label_id in label_ids.tolist()]
+        type_parents = label_index[:len(corpus_types)]
+        type_children = label_index[len(corpus_types):]
+        return cls([T.name for T in trees], label_names, type_parents, type_children, indptr, indices, counts, corpus)
+
+    def save(self, path):
+        '''writes the index to a numpy .npz file'''
+        np.savez(path, names=np.array(self.names, dtype=str), label_names=np.array(self.label_names, dtype=str),
+                 type_parents=self._type_parents, type_children=self._type_children, indptr=self._histograms.indptr,
+                 indices=self._histograms.indices, counts=self._histograms.data,
+                 corpus=np.array('' if self.corpus is None else self.corpus))
+
+    @classmethod
+    def load(cls, path):
+        '''reads an index written by save'''
+        with np.load(path, allow_pickle=False) as data:
+            corpus = str(data['corpus'])
+            return cls(data['names'].tolist(), data['label_names'].tolist(), data['type_parents'], data['type_children'],
+                       data['indptr'], data['indices'], data['counts'], corpus if corpus else None)
+
+    def __len__(self):
+        return len(self.names)
+
+    def tree(self, i):
+        '''returns tree i of the index, taken from the packed corpus or read from its gml file'''
+        if self.corpus is not None:
+            if self._packed_corpus is None:
+                self._packed_corpus = PackedCorpus(self.corpus)
+            return self._packed_corpus[i]
+        return import_tree(self.names[i])
+
+    def upper_bounds(self, T, normalize=False):
+        '''upper bounds of the similarity of T to every tree of the index (see edge_type_upper_bound)'''
+        T = as_tree(T)
+        types, counts = edge_type_histogram(T)
+        #columns of the edge types of T, types missing in the corpus can not be preserved
+        position = np.minimum(np.searchsorted(self._types, types), max(len(self._types)-1, 0))
+        found = self._types[position] == types if len(self._types) else np.zeros(len(types), dtype=bool)
+        query = np.zeros(len(self._types), dtype=np.int64)
+        query[self._type_order[position[found]]] = counts[found]
+        bounds = edge_type_upper_bounds(self._histograms, query).astype(float)
+        if normalize:
+            bounds /= np.maximum(np.maximum(self.num_edges, T.number_of_edges()), 1)
+        return bounds
+
+    def query(self, T, k=10, algorithm='EDGE-PRESERVATION-SIM-APPROX', time_limit=0, normalize=False, solver='gurobi'):
+        '''FUNCTION FOR QUERY-BY-TREE
+            finds the k trees of the index most similar to T (T is G1 of every computation, see compute_similarity)
+
+            output: list of (index of the tree, similarity) sorted by similarity,
+                    number of trees the similarity was computed for'''
+        if k < 1:
+            raise ValueError("k has to be at least 1, got " + str(k))
+        T = as_tree(T)
+        bounds = self.upper_bounds(T, normalize)
+        order = np.argsort(-bounds, kind='stable')
+        #min heap of the k best (similarity, -index)
+        best = []
+        computed = 0
+        for i in order.tolist():
+            if len(best) == k and best[0][0] >= bounds[i]:
+                #no remaining tree can beat the k-th best similarity
+                break
+            similarity, _, _ = compute_similarity(algorithm, T, self.tree(i), time_limit, normalize, verbose=False, solver=solver)
+            computed += 1
+            if len(best) < k:
+                heapq.heappush(best, (similarity, -i))
+            elif similarity > best[0][0]:
+                heapq.heapreplace(best, (similarity, -i))
+        return [(-i, similarity) for similarity, i in sorted(best, reverse=True)], computed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Top-k similarity index for query-by-tree")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser_build = subparsers.add_parser("build", help="Build the index of a collection of trees")
+    parser_build.add_argument("index_path", type=str, help="Path of the index file (.npz)")
+    parser_build.add_argument("graphs", type=str, nargs='+', help="Path to a file with trees, paths to files with trees or a packed corpus")
+    parser_query = subparsers.add_parser("query", help="Find the most similar trees of the index")
+    parser_query.add_argument("index_path", type=str, help="Path of the index file (.npz)")
+    parser_query.add_argument("query", type=str, help="Path to the gml file of the query tree")
+    parser_query.add_argument("--k", default=10, type=int, help="Number of most similar trees (default: 10)")
+    parser_query.add_argument("--algorithm", default="approx", type=str, choices=ALGORITHMS.keys(), help="Version of algorithm (default: approx)")
+    parser_query.add_argument("--time_limit", default=0, dest="limit", type=int, help="Set time limit in seconds for exact algorithm (default: 0 meaning no time limit)")
+    parser_query.add_argument("--normalize", action="store_true", help="Normalize similarity by dividing by max nr. of edges in both trees (default: false meaning no normalization)")
+    parser_query.add_argument("--solver", default="gurobi", type=str, choices=EXACT_SOLVERS.keys(), help="Backend of the exact algorithm (default: gurobi)")
+    parser_query.add_argument("--output", default=None, type=str, help="Path of a csv file the result is saved to")
+    parsed_args = parser.parse_args()
+    if parsed_args.command == "query" and parsed_args.k < 1:
+        parser_query.error("--k has to be at least 1")
+
+    if parsed_args.command == "build":
+        if len(parsed_args.graphs) == 1 and is_packed_corpus(parsed_args.graphs[0]):
+            #case where we have a packed corpus, the index refers to the corpus file
+            corpus_path = os.path.abspath(parsed_args.graphs[0])
+            index = SimilarityIndex.build(PackedCorpus(corpus_path).trees(), corpus=corpus_path)
+        else:
+            if len(parsed_args.graphs) == 1:
+                #case where we have a file with filepaths to trees as lines
+                with open(parsed_args.graphs[0]) as f:
+                    graph_coll = [line.rstrip() for line in f]
+            else:
+                #case where we have a list of filepaths to trees
+                graph_coll = parsed_args.graphs
+            index = SimilarityIndex.build(import_tree_coll([os.path.abspath(path) for path in graph_coll]))
+        index.save(parsed_args.index_path)
+        print("Indexed " + str(len(index)) + " trees to: " + str(parsed_args.index_path))
+
+    else:
+        index = SimilarityIndex.load(parsed_args.index_path)
+        result, computed = index.query(import_tree(parsed_args.query), parsed_args.k, ALGORITHMS[parsed_args.algorithm],
+                                       parsed_args.limit, parsed_args.normalize, parsed_args.solver)
+        df_result = pd.DataFrame([(index.names[i], similarity) for i, similarity in result], columns=['tree', 'similarity'])
+        print(df_result.to_string(index=False))
+        print("Similarity computed for " + str(computed) + " of " + str(len(index)) + " trees.")
+        if parsed_args.output is not None:
+            df_result.to_csv(parsed_args.output, index=False)
+            print("Result saved to: " + str(parsed_args.output))
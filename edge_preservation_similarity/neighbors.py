@@ -0,0 +1,118 @@
+"""
+Created on Oct 2026
+
+sparse top-k / threshold output of the edge preservation similarity
+"""
+
+import os
+import sys
+import inspect
+import heapq
+import numpy as np
+UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+BASE_DIR = os.path.dirname(UTILS_DIR)
+sys.path.append(BASE_DIR)
+from edge_preservation_similarity.utils import *
+from edge_preservation_similarity.compute_eps import compute_similarity_pairs
+from edge_preservation_similarity.corpus import PackedCorpus
+
+
+''' Instead of the dense matrices only the neighbours of every tree are kept: its k most similar trees and/or the trees
+    with a similarity of at least a threshold. The rows are computed in order, a row is complete and passed on as soon
+    as its pairs are computed, so only the neighbours found so far are kept in memory (at most k per tree).
+    Pairs that can not become a neighbour of either tree because of their edge type upper bound
+    (see edge_type_upper_bound) are not computed.
+
+    output file (csv):  one line per neighbour: i,j,similarity,duration (sorted by i and decreasing similarity)'''
+
+
+def compute_neighbors(algorithm, trees, top_k=None, min_similarity=None, time_limit=0, normalize=False, jobs=1, threads=0,
+                      solver='gurobi', deduplicate=True, both_directions=False, batch_pairs=100000):
+    '''FUNCTION FOR THE SPARSE OUTPUT OF THE EDGE PRESERVATION SIMILARITY
+        computes the neighbours of every tree, pairs of a tree with itself are left out
+
+        input:  algorithm:          see compute_similarity
+                trees:              list of trees as Tree or networkx graph objects or a PackedCorpus
+
+                optional:
+                top_k:              number of most similar trees kept per tree (default: None meaning all)
+                min_similarity:     smallest similarity of a neighbour (default: None meaning no threshold)
+                time_limit, normalize, jobs, threads, solver, deduplicate, both_directions: see compute_similarity_pairs,
+                                    with both_directions the maximum of both similarity values is used
+                batch_pairs:        number of pairs computed together (rows are added until the batch is full)
+
+        output: generator of (i, neighbours of tree i) in the order of the trees,
+                neighbours: list of (j, similarity, duration) sorted by decreasing similarity'''
+
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k has to be at least 1, got " + str(top_k))
+    #the worker processes of a corpus map its file instead of receiving the trees
+    shared = trees if isinstance(trees, PackedCorpus) else [as_tree(T) for T in trees]
+    n = len(shared)
+    histograms = edge_type_histograms(shared)
+    num_edges = np.array([T.number_of_edges() for T in shared], dtype=float)
+    #neighbours found so far, a min heap of (similarity, j, duration) per tree
+    found = [[] for _ in range(n)]
+
+    def worst(i):
+        #similarity a pair has to exceed to become a neighbour of tree i
+        if top_k is not None and len(found[i]) >= top_k:
+            return found[i][0][0]
+        return -np.inf
+
+    def add(i, j, similarity, duration):
+        if min_similarity is not None and similarity < min_similarity:
+            return
+        if top_k is None or len(found[i]) < top_k:
+            heapq.heappush(found[i], (similarity, j, duration))
+        elif similarity > found[i][0][0]:
+            heapq.heapreplace(found[i], (similarity, j, duration))
+
+    start = 0
+    while start < n:
+        #rows start..end-1, the pairs of the rows above are computed already
+        pairs = []
+        end = start
+        while end < n and (end == start or len(pairs) < batch_pairs):
+            bounds = edge_type_upper_bounds(histograms, histograms[end].toarray().ravel()).astype(float)
+            if normalize:
+                bounds /= np.maximum(np.maximum(num_edges, num_edges[end]), 1)
+            for j in range(end+1, n):
+                bound = bounds[j]
+                if min_similarity is not None and bound < min_similarity:
+                    continue
+                if top_k is not None and bound <= min(worst(end), worst(j)):
+                    continue
+                pairs.append((end, j))
+            end += 1
+
+        results = compute_similarity_pairs(algorithm, shared, pairs, time_limit, normalize, jobs, threads, solver, deduplicate, both_directions)
+        for (i, j), result in zip(pairs, results):
+            if both_directions:
+                (similarity, duration, _), (similarity_reverse, duration_reverse, _) = result
+                if similarity < similarity_reverse:
+                    similarity, duration = similarity_reverse, duration_reverse
+            else:
+                similarity, duration, _ = result
+            add(i, j, similarity, duration)
+            add(j, i, similarity, duration)
+
+        for i in range(start, end):
+            neighbors = [(j, similarity, duration) for similarity, j, duration in sorted(found[i], key=lambda entry: (-entry[0], entry[1]))]
+            found[i] = None
+            yield i, neighbors
+        start = end
+
+
+def write_neighbors(rows, path):
+    '''writes the rows of compute_neighbors to a csv file (i,j,similarity,duration), every row as soon as it is complete
+        output: number of neighbours written'''
+    count = 0
+    with open(path, 'w') as fp:
+        fp.write('i,j,similarity,duration\n')
+        for i, neighbors in rows:
+            for j, similarity, duration in neighbors:
+                fp.write(str(i) + ',' + str(j) + ',' + repr(float(similarity)) + ',' + repr(float(duration)) + '\n')
+            count += len(neighbors)
+            fp.flush()
+    return count
@@ -0,0 +1,187 @@
+"""
+Created on Oct 2026
+
+out-of-core computation of similarity matrices
+"""
+
+import os
+import sys
+import inspect
+import argparse
+import csv
+import json
+import numpy as np
+UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+BASE_DIR = os.path.dirname(UTILS_DIR)
+sys.path.append(BASE_DIR)
+from edge_preservation_similarity.utils import *
+from edge_preservation_similarity.compute_eps import compute_similarity_matrix, compute_similarity_many_to_many, compute_similarity_pairs, _best_direction
+from edge_preservation_similarity.corpus import PackedCorpus
+
+
+''' The tiled engine splits the pairs of trees into square tiles of tile_size x tile_size pairs. Only the trees of the
+    current tile are loaded and the results are written to memory mapped float32 .npy files, so neither the trees nor
+    the matrices have to fit into memory. The tiles that are done are recorded in a progress .npy file, an interrupted
+    computation can be resumed from it.
+
+    usage (converter): python tiled_matrix.py [required arguments] [optional arguments]
+
+    required arguments:
+            path of matrix      path of a .npy matrix written by the tiled engine
+            path for output     path of the csv file that is written
+    optional arguments:
+            --trees=            path of the list of trees of the matrix (trees_name_of_algorithm.txt), the trees are
+                                used as row and column names (default: row and column numbers)'''
+
+
+#estimated memory of one pair of a tile (results of compute_similarity_pairs and the tile buffers)
+_BYTES_PER_PAIR = 256
+
+
+def tile_size_for_budget(memory_budget):
+    '''largest tile size whose pairs fit into memory_budget (bytes)'''
+    return max(1, int(np.sqrt(memory_budget / _BYTES_PER_PAIR)))
+
+
+def _load_tree(trees, i):
+    #paths of gml files are read when the tree is needed
+    T = trees[i]
+    if isinstance(T, str):
+        return import_tree(T)
+    return as_tree(T)
+
+
+def _tree_name(T):
+    #paths of gml files and names of trees identify the trees of a computation
+    if isinstance(T, str):
+        return T
+    return T.name if isinstance(T, Tree) else str(T.graph.get('name', ''))
+
+
+def compute_similarity_tiled(algorithm, trees, output_path, name, tile_size=1024, time_limit=0, normalize=False, jobs=1,
+                             threads=0, solver='gurobi', deduplicate=True, both_directions=False, resume=False):
+    '''FUNCTION FOR THE OUT-OF-CORE COMPUTATION OF THE SIMILARITY MATRIX
+        computes the symmetric similarity and duration matrices tile by tile, tiles above (and on) the diagonal are
+        computed and mirrored
+
+        input:  algorithm:          see compute_similarity
+                trees:              sequence of trees, paths of gml files are read when needed, the worker processes
+                                    of a PackedCorpus map its file instead of receiving the trees of a tile
+                output_path:        folder of the output
+                name:               name of the output files (e.g. name of the algorithm)
+
+                optional:
+                tile_size:          number of trees per side of a tile (see tile_size_for_budget)
+                time_limit, normalize, jobs, threads, solver, deduplicate, both_directions: see compute_similarity_pairs,
+                                    with both_directions the maximum of both similarity values is saved
+                resume:             flag, if true the tiles that are done in the output files are not computed again
+
+        saves:  similarity_name.npy, duration_name.npy: float32 matrices
+                tiles_name.npy: progress, True for every tile that is done
+                tiles_name.json: trees and settings of the computation, a resumed computation has to use the same
+        output: paths of the similarity and duration matrices'''
+
+    n = len(trees)
+    num_tiles = -(-n // tile_size)
+    similarity_path = os.path.join(output_path, 'similarity_' + name + '.npy')
+    duration_path = os.path.join(output_path, 'duration_' + name + '.npy')
+    progress_path = os.path.join(output_path, 'tiles_' + name + '.npy')
+    settings_path = os.path.join(output_path, 'tiles_' + name + '.json')
+    #same keys as the header of a ResultJournal
+    names = trees.names if isinstance(trees, PackedCorpus) else [_tree_name(T) for T in trees]
+    settings = json.loads(json.dumps({'algorithm': algorithm, 'trees': names, 'time_limit': time_limit, 'normalize': normalize,
+                                      'both_directions': both_directions, 'solver': solver, 'tile_size': tile_size}))
+
+    if resume and os.path.isfile(progress_path):
+        if not os.path.isfile(settings_path):
+            raise ValueError("the output in " + str(output_path) + " has no settings (" + settings_path + ") and can not be resumed")
+        with open(settings_path) as fp:
+            if json.load(fp) != settings:
+                raise ValueError("the output in " + str(output_path) + " was written for other trees or settings")
+        similarity_matrix = np.lib.format.open_memmap(similarity_path, mode='r+')
+        duration_matrix = np.lib.format.open_memmap(duration_path, mode='r+')
+        progress = np.lib.format.open_memmap(progress_path, mode='r+')
+        if similarity_matrix.shape != (n, n) or progress.shape != (num_tiles, num_tiles):
+            raise ValueError("the output in " + str(output_path) + " was written for other trees or another tile size")
+    else:
+        similarity_matrix = np.lib.format.open_memmap(similarity_path, mode='w+', dtype=np.float32, shape=(n, n))
+        duration_matrix = np.lib.format.open_memmap(duration_path, mode='w+', dtype=np.float32, shape=(n, n))
+        progress = np.lib.format.open_memmap(progress_path, mode='w+', dtype=bool, shape=(num_tiles, num_tiles))
+        with open(settings_path, 'w') as fp:
+            json.dump(settings, fp)
+
+    for a in range(num_tiles):
+        if progress[a, a:].all():
+            continue
+        rows = range(a*tile_size, min(n, (a+1)*tile_size))
+        #the trees of the rows stay loaded for all tiles of the row
+        row_trees = [_load_tree(trees, i) for i in rows] if not isinstance(trees, PackedCorpus) else None
+        for b in range(a, num_tiles):
+            if progress[a, b]:
+                continue
+            cols = range(b*tile_size, min(n, (b+1)*tile_size))
+            if isinstance(trees, PackedCorpus):
+                #pairs are given by their index in the corpus
+                pairs = [(i, j) for i in rows for j in cols if a != b or j >= i]
+                results = compute_similarity_pairs(algorithm, trees, pairs, time_limit, normalize, jobs, threads, solver, deduplicate, both_directions)
+                similarity_tile = np.zeros((len(rows), len(cols)))
+                duration_tile = np.zeros((len(rows), len(cols)))
+                for (i, j), result in zip(pairs, results):
+                    similarity, duration, _ = _best_direction(result, both_directions)
+                    similarity_tile[i-rows.start, j-cols.start] = similarity
+                    duration_tile[i-rows.start, j-cols.start] = duration
+                if a == b:
+                    #tiles on the diagonal are symmetric
+                    similarity_tile += np.triu(similarity_tile, 1).T
+                    duration_tile += np.triu(duration_tile, 1).T
+            elif a == b:
+                similarity_tile, duration_tile, _ = compute_similarity_matrix(algorithm, row_trees, time_limit, normalize, both_directions, jobs, threads,
+                                                                              solver, deduplicate)
+            else:
+                col_trees = [_load_tree(trees, j) for j in cols]
+                similarity_tile, duration_tile, _ = compute_similarity_many_to_many(algorithm, row_trees, col_trees, time_limit, normalize, both_directions,
+                                                                                    jobs, threads, solver, deduplicate)
+
+            similarity_matrix[rows.start:rows.stop, cols.start:cols.stop] = similarity_tile
+            similarity_matrix[cols.start:cols.stop, rows.start:rows.stop] = similarity_tile.T
+            duration_matrix[rows.start:rows.stop, cols.start:cols.stop] = duration_tile
+            duration_matrix[cols.start:cols.stop, rows.start:rows.stop] = duration_tile.T
+            similarity_matrix.flush()
+            duration_matrix.flush()
+            #the tile is only marked as done after its results are written
+            progress[a, b] = True
+            progress.flush()
+
+    del similarity_matrix, duration_matrix, progress
+    return similarity_path, duration_path
+
+
+def npy_to_csv(npy_path, csv_path, names=None, rows_per_chunk=1024):
+    '''writes a .npy matrix to a csv file in the layout of pandas.DataFrame.to_csv, the matrix is read in chunks of rows
+        names: row and column names (default: row and column numbers)'''
+    matrix = np.load(npy_path, mmap_mode='r')
+    if names is None:
+        names = [str(i) for i in range(matrix.shape[0])]
+    with open(csv_path, 'w', newline='') as fp:
+        writer = csv.writer(fp)
+        writer.writerow([''] + list(names))
+        for start in range(0, matrix.shape[0], rows_per_chunk):
+            chunk = np.asarray(matrix[start:start+rows_per_chunk])
+            for name, row in zip(names[start:start+rows_per_chunk], chunk.tolist()):
+                #9 significant digits represent every float32 value exactly
+                writer.writerow([name] + ['%.9g' % value for value in row])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts a matrix of the tiled engine (.npy) to a csv file")
+    parser.add_argument("npy_path", type=str, help="Path of the .npy matrix")
+    parser.add_argument("csv_path", type=str, help="Path of the csv file")
+    parser.add_argument("--trees", default=None, type=str, help="Path of the list of trees of the matrix, used as row and column names")
+    parsed_args = parser.parse_args()
+
+    names = None
+    if parsed_args.trees is not None:
+        with open(parsed_args.trees) as f:
+            names = [line.rstrip('\n') for line in f]
+    npy_to_csv(parsed_args.npy_path, parsed_args.csv_path, names)
+    print("Matrix saved to: " + str(parsed_args.csv_path))
@@ -6,16 +6,322 @@ Created on Wed Jul 14 18:20:28 2021, edited Apr 2022
 @authors: nboria, jkiederle
 """
 
-import gurobipy as gu
 import networkx as nx
 import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import linear_sum_assignment, milp, LinearConstraint, Bounds
+from scipy.sparse.csgraph import connected_components
+import time
 import os
+import weakref
+from edge_preservation_similarity.gml import parse_gml, read_gml
 
+try:
+    import gurobipy as gu
+except ImportError:
+    #gurobi is only required for the exact measure and the optional 'gurobi' matching backend
+    gu = None
 
 
-def intersection(lst1, lst2):
-    lst3 = [value for value in lst1 if value in lst2]
-    return lst3
+MATCHING_SOLVERS = ['scipy', 'gurobi']
+
+
+
+def require_gurobi():
+    '''raises an ImportError if gurobipy is not available'''
+    if gu is None:
+        raise ImportError("gurobipy is required for this computation, please install gurobi (see README)")
+
+def solve_assignment(W):
+    '''solves the maximum weight bipartite assignment problem (Hungarian method)
+        input:  W: weight matrix (numpy array or scipy sparse matrix), rows are nodes of G1, columns nodes of G2
+        output: rows, cols: numpy arrays of the matched row and column indices,
+                only pairs with a positive weight are returned'''
+    if sp.issparse(W):
+        #only rows and columns with at least one weight take part in the assignment
+        W = sp.csr_matrix(W)
+        rows = np.flatnonzero(W.getnnz(axis=1))
+        cols = np.flatnonzero(W.getnnz(axis=0))
+        r, c = solve_assignment(W[rows][:, cols].toarray())
+        return rows[r], cols[c]
+    W = np.asarray(W, dtype=float)
+    if W.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    r, c = linear_sum_assignment(W, maximize=True)
+    keep = W[r, c] > 0
+    return r[keep], c[keep]
+
+#gurobi environment of this process, started on first use and shared by all models (see gurobi_env)
+_GUROBI_ENV = None
+_GUROBI_PARAMS = {'OutputFlag': 0, 'Threads': 0}
+
+def configure_gurobi(threads=0):
+    '''sets the parameters of the gurobi environment of this process
+        threads: number of threads of every solve (default: 0 meaning gurobi chooses)
+        an environment that is already started with other parameters is closed, the next model starts a new one'''
+    global _GUROBI_ENV
+    if _GUROBI_PARAMS['Threads'] == threads:
+        return
+    _GUROBI_PARAMS['Threads'] = threads
+    if _GUROBI_ENV is not None:
+        _GUROBI_ENV.dispose()
+        _GUROBI_ENV = None
+
+def gurobi_env():
+    '''returns the gurobi environment of this process, it is started once and its parameters are inherited by every model'''
+    global _GUROBI_ENV
+    require_gurobi()
+    if _GUROBI_ENV is None:
+        env = gu.Env(empty=True)
+        for param, value in _GUROBI_PARAMS.items():
+            env.setParam(param, value)
+        env.start()
+        _GUROBI_ENV = env
+    return _GUROBI_ENV
+
+def gurobi_assignment(W):
+    '''solves the maximum weight bipartite assignment problem as LP with gurobi, same in- and output as solve_assignment'''
+    require_gurobi()
+    W = W.toarray() if sp.issparse(W) else np.asarray(W, dtype=float)
+    n_rows, n_cols = W.shape
+    if n_rows == 0 or n_cols == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    with gu.Model(env=gurobi_env()) as m:
+        x=m.addMVar((n_rows, n_cols), lb=0.0)
+        m.addConstr(x.sum(axis=1)<=1)
+        m.addConstr(x.sum(axis=0)<=1)
+        m.setObjective((W*x).sum(), gu.GRB.MAXIMIZE)
+        m.optimize()
+        r, c = np.nonzero(x.X >= 0.9999)
+    keep = W[r, c] > 0
+    return r[keep], c[keep]
+
+_LABEL_IDS = {}
+_LABEL_NAMES = []
+
+def intern_label(lbl):
+    '''returns the integer id of a node label, ids are shared by all trees of a process'''
+    label_id = _LABEL_IDS.get(lbl)
+    if label_id is None:
+        label_id = len(_LABEL_NAMES)
+        _LABEL_IDS[lbl] = label_id
+        _LABEL_NAMES.append(lbl)
+    return label_id
+
+def label_name(label_id):
+    '''returns the node label of an interned label id'''
+    return _LABEL_NAMES[label_id]
+
+#ids of the canonical forms of subtrees: (label id, sorted ids of the subtrees of the children) -> id
+_CANONICAL_IDS = {}
+
+class Tree:
+    '''compact immutable representation of a rooted, unordered, node-labeled tree
+        nodes are 0..n-1, the root has parent -1
+        parents:    parent of every node
+        child_ptr, children: children of every node in CSR format, children of v are children[child_ptr[v]:child_ptr[v+1]]
+        labels:     interned label id of every node (see intern_label)
+        depths:     depth of every node, the root has depth 0
+        parities:   depth parity (0: even, 1: odd) of every node, used to split the nodes in the approximation
+        edges:      array of shape (n-1, 2) with one (parent, child) row per non-root node
+        name:       optional name of the tree (e.g. its file path)'''
+
+    __slots__ = ('parents', 'child_ptr', 'children', 'labels', 'depths', 'parities', 'edges', 'name', '_canonical_id')
+
+    def __init__(self, parents, labels, name=None):
+        '''input:  parents: parent of every node, -1 for the root
+                labels: interned label id of every node'''
+        parents = np.asarray(parents, dtype=np.int32)
+        labels = np.asarray(labels, dtype=np.int32)
+        n = len(parents)
+        if len(labels) != n:
+            raise ValueError("parents and labels must have the same length")
+        roots = np.flatnonzero(parents < 0)
+        if n > 0 and len(roots) != 1:
+            raise ValueError("a tree needs exactly one root, found " + str(len(roots)))
+        non_root = np.flatnonzero(parents >= 0)
+        children = non_root[np.argsort(parents[non_root], kind='stable')].astype(np.int32)
+        child_ptr = np.zeros(n+1, dtype=np.int32)
+        np.cumsum(np.bincount(parents[non_root], minlength=n), out=child_ptr[1:])
+
+        #depths in breadth first order starting at the root
+        depths = np.full(n, -1, dtype=np.int32)
+        if n > 0:
+            depths[roots[0]] = 0
+            children_list = children.tolist()
+            ptr_list = child_ptr.tolist()
+            queue = [int(roots[0])]
+            for v in queue:
+                for child in children_list[ptr_list[v]:ptr_list[v+1]]:
+                    depths[child] = depths[v]+1
+                    queue.append(child)
+            if len(queue) != n:
+                raise ValueError("parents do not describe a tree, not all nodes are reachable from the root")
+
+        for attr, value in (('parents', parents), ('child_ptr', child_ptr), ('children', children), ('labels', labels), ('depths', depths), ('parities', depths%2)):
+            value.setflags(write=False)
+            object.__setattr__(self, attr, value)
+        edges = np.column_stack((parents[non_root], non_root)).astype(np.int32)
+        edges.setflags(write=False)
+        object.__setattr__(self, 'edges', edges)
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, '_canonical_id', None)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("Tree objects are immutable")
+
+    def __reduce__(self):
+        #label ids are process local, so labels are pickled by name and interned again when loading
+        return (Tree.from_labels, (self.parents, self.label_names(), self.name))
+
+    def __len__(self):
+        return len(self.parents)
+
+    def __repr__(self):
+        return "Tree(n=" + str(len(self)) + ", name=" + repr(self.name) + ")"
+
+    def order(self):
+        '''number of nodes, same as networkx'''
+        return len(self.parents)
+
+    def number_of_edges(self):
+        '''number of edges, same as networkx'''
+        return len(self.edges)
+
+    def root(self):
+        return int(np.flatnonzero(self.parents < 0)[0])
+
+    def canonical_id(self):
+        '''canonical form of the tree (AHU): two trees get the same id if and only if they are isomorphic as rooted,
+            unordered, labeled trees, ids are process local like label ids (see _CANONICAL_IDS)
+            the id is computed on the first call and kept by the tree'''
+        if self._canonical_id is None:
+            labels = self.labels.tolist()
+            ptr = self.child_ptr.tolist()
+            children = self.children.tolist()
+            codes = [0]*len(self)
+            #children before parents: nodes by decreasing depth
+            for v in np.argsort(-self.depths, kind='stable').tolist():
+                key = (labels[v],) + tuple(sorted([codes[child] for child in children[ptr[v]:ptr[v+1]]]))
+                codes[v] = _CANONICAL_IDS.setdefault(key, len(_CANONICAL_IDS))
+            object.__setattr__(self, '_canonical_id', codes[self.root()] if len(self) > 0 else -1)
+        return self._canonical_id
+
+    def label_names(self):
+        '''returns the node labels as strings'''
+        return [label_name(label_id) for label_id in self.labels.tolist()]
+
+    @classmethod
+    def from_labels(cls, parents, label_names, name=None):
+        '''creates a tree from a parent array and the node labels as strings'''
+        return cls(parents, [intern_label(lbl) for lbl in label_names], name)
+
+    @classmethod
+    def from_networkx(cls, G, name=None):
+        '''converts a tree as read by nx.read_gml(path, label="id") to a Tree
+            nodes have to be 0..n-1 with an attribute 'lbl', the root is node 0
+            edges are oriented away from the root, so bidirected and undirected trees are converted as well'''
+        n = G.order()
+        if set(G.nodes) != set(range(n)):
+            raise ValueError("nodes of the tree have to be numbered 0..n-1")
+        parents = np.full(n, -1, dtype=np.int32)
+        if n > 0:
+            num_reached = 1
+            for child, parent in nx.bfs_predecessors(G, 0):
+                parents[child] = parent
+                num_reached += 1
+            if num_reached != n:
+                raise ValueError("not all nodes of the tree are reachable from the root 0")
+        return cls.from_labels(parents, [G.nodes[v]['lbl'] for v in range(n)], name)
+
+    def to_networkx(self):
+        '''converts the tree to a networkx DiGraph with the node attributes lbl and depth'''
+        G = nx.DiGraph()
+        for v, (lbl, depth) in enumerate(zip(self.label_names(), self.depths.tolist())):
+            G.add_node(v, lbl=lbl, depth=depth)
+        G.add_edges_from(self.edges.tolist())
+        return G
+
+#Tree of every converted networkx graph, so repeated computations on the same graph convert it only once
+_TREE_CACHE = weakref.WeakKeyDictionary()
+
+def as_tree(G):
+    '''returns G as Tree, networkx graphs are converted once and the result is cached
+        note: the cache only notices changes of the number of nodes or edges,
+              use Tree.from_networkx directly for graphs that are modified in place'''
+    if isinstance(G, Tree):
+        return G
+    size = (G.number_of_nodes(), G.number_of_edges())
+    cached = _TREE_CACHE.get(G)
+    if cached is not None and cached[0] == size:
+        return cached[1]
+    T = Tree.from_networkx(G)
+    _TREE_CACHE[G] = (size, T)
+    return T
+
+def canonical_classes(trees):
+    '''groups isomorphic trees (see Tree.canonical_id)
+        output: array with the index of the first tree isomorphic to every tree (its representative)'''
+    first = {}
+    return np.array([first.setdefault(as_tree(T).canonical_id(), i) for i, T in enumerate(trees)], dtype=np.int64)
+
+def edge_type_histogram(T):
+    '''counts the edges of T by edge type (label of parent, label of child)
+        output: types, counts: sorted edge types (encoded as parent label id * 2^32 + child label id) and their counts'''
+    types=(T.labels[T.edges[:,0]].astype(np.int64) << 32) | T.labels[T.edges[:,1]].astype(np.int64)
+    return np.unique(types, return_counts=True)
+
+def edge_type_upper_bound(G1, G2):
+    '''upper bound of the edge preservation similarity: a preserved duo maps an edge of G1 to an edge of G2 of the same type,
+        so at most the smaller number of edges of every type can be preserved'''
+    types_G1, counts_G1 = edge_type_histogram(as_tree(G1))
+    types_G2, counts_G2 = edge_type_histogram(as_tree(G2))
+    _, index_G1, index_G2 = np.intersect1d(types_G1, types_G2, assume_unique=True, return_indices=True)
+    return int(np.minimum(counts_G1[index_G1], counts_G2[index_G2]).sum())
+
+def edge_type_histograms(trees):
+    '''edge type histograms (see edge_type_histogram) of a list of trees as one sparse matrix
+        output: csr matrix of shape (len(trees), number of edge types of all trees) with the number of edges of every type'''
+    histograms=[edge_type_histogram(as_tree(T)) for T in trees]
+    if not histograms:
+        return sp.csr_matrix((0, 0), dtype=np.int64)
+    _, indices=np.unique(np.concatenate([types for types, _ in histograms]), return_inverse=True)
+    indptr=np.zeros(len(histograms)+1, dtype=np.int64)
+    np.cumsum([len(types) for types, _ in histograms], out=indptr[1:])
+    counts=np.concatenate([counts for _, counts in histograms]).astype(np.int64)
+    return sp.csr_matrix((counts, indices, indptr), shape=(len(histograms), int(indices.max())+1 if len(indices) else 0))
+
+def edge_type_upper_bounds(histograms, query):
+    '''upper bounds of the similarity (see edge_type_upper_bound) of one tree to every tree of a histogram matrix
+        input:  histograms: csr matrix of edge type counts with one row per tree (e.g. of edge_type_histograms)
+                query: edge type counts of the tree in the columns of histograms (e.g. one dense row of histograms)
+        output: array with the bound of every row'''
+    bounds=histograms.copy()
+    bounds.data=np.minimum(bounds.data, np.asarray(query)[bounds.indices])
+    return np.asarray(bounds.sum(axis=1)).ravel()
+
+def child_label_counts(T, labels, num_labels):
+    '''counts the children of every node of T by label
+        input:  T: Tree, labels: array of label indices of the nodes of T
+        output: array of shape (T.order(), num_labels)'''
+    counts=np.zeros((T.order(), num_labels))
+    np.add.at(counts, (T.edges[:,0], labels[T.edges[:,1]]), 1)
+    return counts
+
+def label_blocks(labels_G1, labels_G2):
+    '''groups the nodes of two trees by label, nodes of different labels are never matched to each other
+        input:  labels_G1, labels_G2: label ids of the nodes of G1 and G2
+        output: list of (V1, V2): index arrays of the nodes of G1 and G2 of one label, labels missing in one tree are left out'''
+    labels_G1=np.asarray(labels_G1)
+    labels_G2=np.asarray(labels_G2)
+    common=np.intersect1d(labels_G1, labels_G2)
+    order_G1=np.argsort(labels_G1, kind='stable')
+    order_G2=np.argsort(labels_G2, kind='stable')
+    sorted_G1=labels_G1[order_G1]
+    sorted_G2=labels_G2[order_G2]
+    start_G1, end_G1=np.searchsorted(sorted_G1, common), np.searchsorted(sorted_G1, common, side='right')
+    start_G2, end_G2=np.searchsorted(sorted_G2, common), np.searchsorted(sorted_G2, common, side='right')
+    return [(order_G1[a1:b1], order_G2[a2:b2]) for a1, b1, a2, b2 in zip(start_G1, end_G1, start_G2, end_G2)]
 
 class Evaluator:
     '''an instance of this is needed to compute the final result of the edge preservation similarity'''
@@ -27,284 +333,429 @@ class Evaluator:
         return None
         
     
-    def evaluate_sol(self,G1,G2,sol):
-        '''use this to get the egde preservation similarity computed (either approx or exact)'''
+    def evaluate_sol(self,G1,G2,sol,store_duos=True):
+        '''use this to get the egde preservation similarity computed (either approx or exact)
+            every edge of G1 is checked once whether its image under the mapping sol is an edge of G2
+            G1, G2: trees as Tree objects (networkx graphs are converted)
+            store_duos: if false, only the score is computed and the preserved duos are not stored'''
+        G1=as_tree(G1)
+        G2=as_tree(G2)
         self._preserved_duos_G1=[]
         self._preserved_duos_G2=[]
-        self._evaluation=0
-        matched_G1=[m[0] for m in sol]
-        #print('matched_G1',matched_G1)
-        matched_G2=[m[1]-G1.order() for m in sol]
-        #print('matched_G2',matched_G2)
-        edges_G1=list(G1.edges)
-        edges_G2=list(G2.edges)
-        #print(edges_G1)
-        for i in range(len(matched_G1)):
-            for j in range(len(matched_G1)):
-                if (matched_G1[i],matched_G1[j]) in edges_G1:
-                    if (matched_G2[i],matched_G2[j]) in edges_G2:
-                        self._evaluation+=1
-                        self._preserved_duos_G1.append([matched_G1[i],matched_G1[j]])
-                        self._preserved_duos_G2.append([matched_G2[i],matched_G2[j]])                        
+        mapping=np.full(G1.order(), -1, dtype=np.int64)
+        if len(sol) > 0:
+            sol=np.asarray(sol, dtype=np.int64)
+            mapping[sol[:,0]]=sol[:,1]-G1.order()
+        mapped=mapping[G1.edges]
+        #(a, b) is an edge of G2 iff a is the parent of b
+        valid=(mapped>=0).all(axis=1)
+        preserved=np.zeros(len(mapped), dtype=bool)
+        preserved[valid]=G2.parents[mapped[valid,1]]==mapped[valid,0]
+        self._evaluation=int(preserved.sum())
+        if store_duos:
+            self._preserved_duos_G1=G1.edges[preserved].tolist()
+            self._preserved_duos_G2=mapped[preserved].tolist()
         return self._evaluation
         
-class Gurobi_solver:
-    '''an instance of this is needed to exactly compute the edge preservation similarity'''
+class Exact_model:
+    '''compact linearized formulation of the exact edge preservation similarity of the trees G1 and G2
+
+        variables:      x[k] (binary):     node pair k (pair_G1[k], pair_G2[k]) with equal labels is mapped
+                        z[l] (in [0,1]):   duo (parent, duo_G1[l]) of G1 is preserved as duo (parent, duo_G2[l]) of G2,
+                                            only for pairs of children with equal labels whose parents have equal labels as well
+        constraints:    every node is mapped at most once
+                        z[l] <= x[child pair of l]
+                        sum of z over the children d of a node c of G2 <= x[parent(b), c] for every child b of G1
+        objective:      maximize sum(z), the number of preserved duos
+
+        all constraints are stored as one sparse matrix A over the variables [x, z] with A @ [x, z] <= b
+
+        kernelize: if true, node pairs that are neither the children nor the parents of a duo are left out,
+                   they can never change the objective (e.g. nodes whose label or edges whose type is missing in the other tree)'''
+
+    def __init__(self,G1,G2,kernelize=True):
+        G1=as_tree(G1)
+        G2=as_tree(G2)
+        self.n1=G1.order()
+        self.n2=G2.order()
+        self.G1=G1
+        self.pair_G1, self.pair_G2 = np.nonzero(G1.labels[:,None]==G2.labels[None,:])
+        num_x=len(self.pair_G1)
+        self.pair_index=np.full((self.n1, self.n2), -1, dtype=np.int64)
+        self.pair_index[self.pair_G1, self.pair_G2]=np.arange(num_x)
+
+        #duo variables: pairs of children whose parents can be mapped to each other
+        parent_G1=G1.parents[self.pair_G1]
+        parent_G2=G2.parents[self.pair_G2]
+        has_duo=(parent_G1>=0) & (parent_G2>=0)
+        has_duo[has_duo]=self.pair_index[parent_G1[has_duo], parent_G2[has_duo]]>=0
+        duo_x=np.flatnonzero(has_duo)
+        parent_x=self.pair_index[parent_G1[duo_x], parent_G2[duo_x]]
+        if kernelize:
+            relevant=np.unique(np.concatenate((duo_x, parent_x)))
+            new_index=np.full(num_x, -1, dtype=np.int64)
+            new_index[relevant]=np.arange(len(relevant))
+            self.pair_index[self.pair_G1, self.pair_G2]=new_index
+            self.pair_G1=self.pair_G1[relevant]
+            self.pair_G2=self.pair_G2[relevant]
+            duo_x=new_index[duo_x]
+            parent_x=new_index[parent_x]
+            num_x=len(relevant)
+        num_z=len(duo_x)
+        self.duo_G1=self.pair_G1[duo_x]
+        self.duo_G2=self.pair_G2[duo_x]
+        self.duo_x=duo_x
+        self.parent_x=parent_x
+        #one aggregated constraint per (child in G1, parent in G2)
+        _, first, group=np.unique(self.duo_G1*self.n2+G2.parents[self.duo_G2], return_index=True, return_inverse=True)
+        num_groups=len(first)
 
-    def __init__(self,verbose=None):
+        z=num_x+np.arange(num_z)
+        rows=np.concatenate((self.pair_G1, self.n1+self.pair_G2,
+                             self.n1+self.n2+np.arange(num_z), self.n1+self.n2+np.arange(num_z),
+                             self.n1+self.n2+num_z+group, self.n1+self.n2+num_z+np.arange(num_groups)))
+        cols=np.concatenate((np.arange(num_x), np.arange(num_x), z, duo_x, z, parent_x[first]))
+        values=np.concatenate((np.ones(2*num_x), np.ones(num_z), -np.ones(num_z), np.ones(num_z), -np.ones(num_groups)))
+        self.A=sp.csr_matrix((values, (rows, cols)), shape=(self.n1+self.n2+num_z+num_groups, num_x+num_z))
+        self.b=np.concatenate((np.ones(self.n1+self.n2), np.zeros(num_z+num_groups)))
+        self.c=np.concatenate((np.zeros(num_x), np.ones(num_z)))
+        self.integrality=np.concatenate((np.ones(num_x, dtype=np.int64), np.zeros(num_z, dtype=np.int64)))
+        self.num_x=num_x
+        self.num_z=num_z
+
+    def num_vars(self):
+        return self.num_x+self.num_z
+
+    def components(self):
+        '''splits the model into independent parts, no constraint contains variables of two different parts
+            two node pairs are in the same part if they share a node or are the children and parents of one duo
+            output: list of (variable indices, constraint indices), one per part'''
+        if self.num_vars()==0:
+            return []
+        n=self.n1+self.n2
+        rows=np.concatenate((self.pair_G1, self.duo_G1))
+        cols=np.concatenate((self.n1+self.pair_G2, self.G1.parents[self.duo_G1]))
+        _, node_component=connected_components(sp.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n)), directed=False)
+        var_component=np.concatenate((node_component[self.pair_G1], node_component[self.duo_G1]))
+        #every used constraint belongs to the part of its first variable, constraints of nodes without pairs are empty
+        used_rows=np.flatnonzero(np.diff(self.A.indptr)>0)
+        row_component=var_component[self.A.indices[self.A.indptr[used_rows]]]
+        var_order=np.argsort(var_component, kind='stable')
+        row_order=np.argsort(row_component, kind='stable')
+        components, var_split=np.unique(var_component[var_order], return_index=True)
+        row_split=np.searchsorted(row_component[row_order], components)
+        return list(zip(np.split(var_order, var_split[1:]), np.split(used_rows[row_order], row_split[1:])))
+
+    def upper_bound(self,var_idx):
+        '''upper bound of the objective of the variables var_idx: every child of G1 and of G2 is in at most one preserved duo'''
+        z=var_idx[var_idx>=self.num_x]-self.num_x
+        return min(len(np.unique(self.duo_G1[z])), len(np.unique(self.duo_G2[z])))
+
+    def solution(self,values):
+        '''returns the mapping of a solution vector [x, z] in the format of the Evaluator: pairs [v1, v2+n1]'''
+        mapped=np.flatnonzero(values[:self.num_x]>=0.5)
+        return [[int(self.pair_G1[k]), int(self.pair_G2[k])+self.n1] for k in mapped]
+
+    def start_vector(self,sol):
+        '''returns the solution vector [x, z] of a mapping in the format of the Evaluator, e.g. to warm start a solver
+            pairs of different labels are left out'''
+        values=np.zeros(self.num_vars())
+        if len(sol) > 0:
+            sol=np.asarray(sol, dtype=np.int64)
+            k=self.pair_index[sol[:,0], sol[:,1]-self.n1]
+            values[k[k>=0]]=1
+        values[self.num_x:]=values[self.duo_x]*values[self.parent_x]
+        return values
+
+    def preserved_duos(self,values):
+        '''returns the preserved duos [parent, child] of G1 of a solution vector [x, z]'''
+        preserved=np.flatnonzero(values[self.num_x:]>=0.5)
+        return [[int(self.G1.parents[child]), int(child)] for child in self.duo_G1[preserved]]
+
+class Exact_solver:
+    '''base class of the backends of the exact edge preservation similarity (see EXACT_SOLVERS)
+        the backends only implement _solve for one part of the model, Exact_model.components splits the model into
+        independent parts which are solved one after another'''
+
+    def __init__(self,verbose=None,kernelize=True):
         self._name='EDGE-PRESERVATION-SIM-EXACT'
         self._sol=None
         self._verbose=verbose
         if self._verbose is None:
             self._verbose=False
+        self._kernelize=kernelize
         self._preserved_duos_G1=[]
-    
-    def compute_duos(self,G1,G2,timelimit=0):
+
+    def compute_duos(self,G1,G2,timelimit=0,start=None,upper_bound=None):
         '''this function is called to construct the matching(preserved duos) between graphs G1 and G2
-            It always needs to be called before evaluating it with the Evaluator to get a result'''
-            
+            It always needs to be called before evaluating it with the Evaluator to get a result
+            the model only contains label compatible node pairs and duos (see Exact_model)
+
+            optional:
+            start:          feasible mapping (e.g. of Approx_alg) to start from, with a time limit and without a start
+                            the approximation is used, parts of the model that get no time keep the start
+            upper_bound:    upper bound of the similarity (e.g. edge_type_upper_bound), added as objective cutoff,
+                            the solver stops as soon as a solution reaches it
+            output:         True if the time limit was reached'''
+
         self._preserved_duos_G1=[]
         self._sol=[]
-        m=gu.Model('distance')
-        m.setParam('OutputFlag', self._verbose)
-        if timelimit > 0:
-            m.setParam("TimeLimit", timelimit)
-        
-        #VARIABLES
-        x = {}
-        # xij = mapping node i to node j
-        for i in range(G1.order()):
-            for j in range(G2.order()):
-                x[i, j] = m.addVar(vtype=gu.GRB.BINARY)
-        y = {}
-        # yij =1 if duo ij is saved else 0
-        for edge in list(G1.edges):
-            y[edge[0],edge[1]]=m.addVar(vtype=gu.GRB.BINARY)
-        
-        m.update()
-        
-        #CONSTRAINTS
-        
-        for i in range(G1.order()):
-            for j in range(G2.order()):
-                if G1.nodes[i]['lbl']!= G2.nodes[j]['lbl']:
-                    m.addConstr(x[i, j]==0)
-        for i in range(G1.order()):
-            m.addConstr(gu.quicksum(x[i,j] for j in range(G2.order()))<=1)
-        for j in range(G2.order()):
-            m.addConstr(gu.quicksum(x[i,j] for i in range(G1.order()))<=1)
-        for edge1 in list(G1.edges):
-            m.addConstr(y[edge1[0],edge1[1]]<=gu.quicksum(x[edge1[0],edge2[0]]*x[edge1[1],edge2[1]] for edge2 in list(G2.edges)))
-        
-        #OBJECTIVE
-        m.setObjective(gu.quicksum(y[edge[0],edge[1]] for edge in list(G1.edges)), gu.GRB.MAXIMIZE)
-        
-        m.optimize()
-        self._sol=[]
-        for i in range(G1.order()):
-            for j in range(G2.order()):
-                if x[i,j].X>=0.99999:
-                    self._sol.append([i,j+G1.order()])
-        
-        for edge in list(G1.edges):
-            if y[edge[0],edge[1]].X>=0.99999:
-                self._preserved_duos_G1.append([edge[0],edge[1]])
-        
-        if m.status == 9:
+        tic=time.time()
+        model=Exact_model(G1,G2,self._kernelize)
+        #small parts first, the time they do not use is left to the larger ones
+        components=sorted(model.components(), key=lambda component: len(component[0]))
+        if start is None and timelimit > 0 and len(components) > 0:
+            #parts that run out of time keep the mapping of the approximation instead of an empty one
+            ALG=Approx_alg()
+            ALG.compute_duos(G1,G2)
+            start=ALG._sol
+        values=np.zeros(model.num_vars()) if start is None else model.start_vector(start)
+        time_limit_reached=False
+        for k, (var_idx, row_idx) in enumerate(components):
+            remaining=0
+            if timelimit > 0:
+                #the remaining time is shared evenly by the remaining parts
+                remaining=timelimit-(time.time()-tic)
+                if remaining <= 0:
+                    time_limit_reached=True
+                    continue
+                remaining/=len(components)-k
+            bound=model.upper_bound(var_idx)
+            if upper_bound is not None and len(components)==1:
+                bound=min(bound, upper_bound)
+            start_values=None
+            if start is not None:
+                start_values=values[var_idx]
+                if model.c[var_idx] @ start_values >= bound:
+                    #the start is already optimal on this part
+                    continue
+            part_values, reached=self._solve(model.A[row_idx][:,var_idx], model.b[row_idx], model.c[var_idx], model.integrality[var_idx],
+                                             remaining, start_values, bound)
+            if part_values is not None:
+                values[var_idx]=part_values
+            time_limit_reached=time_limit_reached or reached
+        self._sol=model.solution(values)
+        self._preserved_duos_G1=model.preserved_duos(values)
+        return time_limit_reached
+
+    def _solve(self,A,b,c,integrality,timelimit,start,upper_bound):
+        '''maximizes c @ v subject to A @ v <= b, 0 <= v <= 1 and v[integrality==1] binary
+            input:  timelimit: time limit in seconds (0 meaning no limit)
+                    start: feasible solution vector or None
+                    upper_bound: upper bound of the objective
+            output: values: solution vector or None if no solution was found, time_limit_reached'''
+        raise NotImplementedError
+
+class Gurobi_solver(Exact_solver):
+    '''an instance of this is needed to exactly compute the edge preservation similarity with gurobi'''
+
+    def _solve(self,A,b,c,integrality,timelimit,start,upper_bound):
+        require_gurobi()
+        #the model is created in the shared environment of this process and freed right after the solve
+        with gu.Model('distance', env=gurobi_env()) as m:
+            m.setParam('OutputFlag', self._verbose)
+            if timelimit > 0:
+                m.setParam("TimeLimit", timelimit)
+            v=m.addMVar(len(c), lb=0.0, ub=1.0, vtype=np.where(integrality==1, gu.GRB.BINARY, gu.GRB.CONTINUOUS))
+            m.addMConstr(A, v, '<', b)
+            m.setObjective(c @ v, gu.GRB.MAXIMIZE)
+            if start is not None:
+                v.Start=start
+            m.addConstr(c @ v <= upper_bound)
+            m.setParam('BestObjStop', upper_bound)
+            m.optimize()
+            values=v.X if m.SolCount > 0 else None
             #time limit reached
-            print(m.status)
-            return True
-        return False
+            return values, m.status == gu.GRB.TIME_LIMIT
+
+class Highs_solver(Exact_solver):
+    '''an instance of this can be used instead of Gurobi_solver to exactly compute the edge preservation similarity
+        with the open-source MILP solver HiGHS bundled with scipy, no license is needed
+        milp takes no MIP start, the value of the start is added as lower bound of the objective instead'''
+
+    def _solve(self,A,b,c,integrality,timelimit,start,upper_bound):
+        constraints=[LinearConstraint(A, -np.inf, b), LinearConstraint(c[None,:], -np.inf, upper_bound)]
+        if start is not None:
+            constraints.append(LinearConstraint(c[None,:], c @ start, np.inf))
+        options={'disp': bool(self._verbose)}
+        if timelimit > 0:
+            options['time_limit']=timelimit
+        #milp minimizes
+        res=milp(-c, integrality=integrality, bounds=Bounds(0, 1), constraints=constraints, options=options)
+        #time limit reached
+        return res.x, res.status == 1
+
+#backends for the exact edge preservation similarity, all of them solve Exact_model
+EXACT_SOLVERS = {
+    'gurobi': Gurobi_solver,
+    'highs': Highs_solver
+}
  
 class Approx_alg:
-    '''an instance of this is needed to approximately compute the edge preservation similarity'''
+    '''an instance of this is needed to approximately compute the edge preservation similarity
+        pairs of nodes with different labels never get a weight, so every matching problem is split into
+        one independent assignment problem per label (see label_blocks)'''
 
-    def __init__(self):
+    def __init__(self, solver='scipy'):
         self._name='EDGE-PRESERVATION-SIM-APPROX'
+        if solver not in MATCHING_SOLVERS:
+            raise ValueError("unknown matching solver: " + str(solver))
+        self._solver=solver
         return None
 
     def compute_duos(self,G1,G2):
         '''this function is called to construct the matching(preserved duos) between graphs G1 and G2
             It always needs to be called before evaluating it with the Evaluator to get a result'''
 
-        self.init_match(G1,G2)
+        G1=as_tree(G1)
+        G2=as_tree(G2)
+        self._best_eval, self._sol=self._best_sol(G1,G2,self.create_LM_blocks(G1,G2))
+
+    def compute_duos_both(self,G1,G2):
+        '''constructs the matchings of G1 to G2 (stored as for compute_duos) and of G2 to G1 (stored in _sol_reverse and
+            _best_eval_reverse, mapping G2 to G1) together, the LM-Graph of G2 to G1 is the transpose of the one of G1 to G2'''
+        G1=as_tree(G1)
+        G2=as_tree(G2)
+        LM_blocks=self.create_LM_blocks(G1,G2)
+        self._best_eval, self._sol=self._best_sol(G1,G2,LM_blocks)
+        self._best_eval_reverse, self._sol_reverse=self._best_sol(G2,G1,[(V2, V1, W.T) for V1, V2, W in LM_blocks])
+
+    def _best_sol(self,G1,G2,LM_blocks):
+        '''computes all solutions on the given LM-Graph and returns the best evaluation and solution'''
+        self.init_match(G1,G2,LM_blocks)
         self.complete_Sols(G1,G2)
-        self._best_eval=0
+        best_eval=0
+        best_sol=None
         E=Evaluator()
         for sol in self._sols:
-            if E.evaluate_sol(G1,G2,sol)>= self._best_eval:
-                self._best_eval=E._evaluation
-                self._sol=sol
-                
-    def matching_solver(self,G1,G2,LMG):
-        #reindexing nodes
-        edges=list(LMG.edges())
-        weights=[]
-        for i,edge in enumerate(edges):
-            weights.append(LMG[edge[0]][edge[1]]['weight'])
-            edges[i]=sorted(edge)
-        list_indices_G1=[]
-        list_indices_G2=[]
-        for node in LMG.nodes:
-            if node < G1.order():
-                list_indices_G1.append(node)
-            else:
-                list_indices_G2.append(node)
-        m=gu.Model()
-        m.setParam('OutputFlag', 0)
-        x={}
-        for i in list_indices_G1:
-            for j in list_indices_G2:
-                x[i,j]=m.addVar()
-        m.update()
-        for i in list_indices_G1:
-            m.addConstr(gu.quicksum(x[i,j] for j in list_indices_G2)<=1)
-        for j in list_indices_G2:
-            m.addConstr(gu.quicksum(x[i,j] for i in list_indices_G1)<=1)
-
-        m.setObjective(gu.quicksum(x[e[0],e[1]]*weights[i] for i,e in enumerate(edges)), gu.GRB.MAXIMIZE)
-        m.optimize()
-        sol=[]
-        for e in edges:
-                if x[e[0],e[1]].X >= 0.9999 :
-                    sol.append([e[0],e[1]])
-        return sol
+            if E.evaluate_sol(G1,G2,sol,store_duos=False)>= best_eval:
+                best_eval=E._evaluation
+                best_sol=sol
+        return best_eval, best_sol
                 
-            
+    def matching_solver(self,W):
+        '''computes a maximum weight matching on the weight matrix W (rows: nodes of G1, columns: nodes of G2)
+            output: rows, cols: index arrays of the matched pairs'''
+        if self._solver == 'gurobi':
+            return gurobi_assignment(W)
+        return solve_assignment(W)
+
+    def solve_blocks(self,blocks):
+        '''computes a maximum weight matching for every label block
+            input:  blocks: list of (V1, V2, W): nodes of G1 and G2 of one label and their weight matrix of shape (len(V1), len(V2))
+            output: rows, cols: nodes of G1 and G2 of all matched pairs'''
+        blocks=[block for block in blocks if block[2].size > 0]
+        if not blocks:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        matchings=[self.matching_solver(W) for _, _, W in blocks]
+        rows=np.concatenate([V1[r] for (V1, _, _), (r, _) in zip(blocks, matchings)])
+        cols=np.concatenate([V2[c] for (_, V2, _), (_, c) in zip(blocks, matchings)])
+        return rows, cols
+
+    def create_LM_blocks(self,G1,G2):
+        '''creates the weights of the Local Match (LM)-Graph, a weighted bipartite graph between V_g1 and V_g2
+            only pairs of vertices that share the same label get a weight, so the graph is stored as one block per label
+            weight: number of duos that can be preserved locally by mapping v1 to v2 (plus a small epsilon)
+            preserved duo: child nodes of v1 and v2 match
+            output: list of (V1, V2, W) (see solve_blocks)'''
+        #label ids are compressed to the labels occurring in G1 or G2
+        num_labels, lbl=np.unique(np.concatenate((G1.labels, G2.labels)), return_inverse=True)
+        num_labels=len(num_labels)
+        lbl_G1=lbl[:G1.order()]
+        lbl_G2=lbl[G1.order():]
+        counts_G1=child_label_counts(G1, lbl_G1, num_labels)
+        counts_G2=child_label_counts(G2, lbl_G2, num_labels)
+        #only child labels of both trees can add to a weight
+        child_labels=np.flatnonzero(counts_G1.any(axis=0) & counts_G2.any(axis=0))
+        blocks=[]
+        for V1, V2 in label_blocks(lbl_G1, lbl_G2):
+            W=np.full((len(V1), len(V2)), 0.00001)
+            for i in child_labels:
+                #the number of preservable duos per label is the smaller number of children with that label
+                W+=np.minimum.outer(counts_G1[V1,i], counts_G2[V2,i])
+            blocks.append((V1, V2, W))
+        return blocks
 
-    def edge_weight(self,G1,v1_id,G2,v2_id):
-        '''weight of edge, number of duos that can be preserved locally by mapping V_g1 and V_g2'''
-        labels_G1 = self._labels_G1
-        labels_G2 = self._labels_G2
-        if labels_G1[v1_id]!=labels_G2[v2_id]:
-            return 0
-        all_attr=self._all_attr
-        num_child_by_attr_v1=np.zeros((len(all_attr)))
-        num_child_by_attr_v2=np.zeros((len(all_attr)))
-        for child in G1.neighbors(v1_id):
-            for i in range(len(all_attr)):
-                if labels_G1[child]==all_attr[i]:
-                    num_child_by_attr_v1[i]+=1
-        for child in G2.neighbors(v2_id):
-            for i in range(len(all_attr)):
-                if labels_G2[child]==all_attr[i]:
-                    num_child_by_attr_v2[i]+=1
-        score=0.00001
-        for i in range(len(all_attr)):
-            score+=min([num_child_by_attr_v1[i],num_child_by_attr_v2[i]])
-        return score
-    
-    def create_LM_graph(self,G1,G2):
-        '''creates a Local Match (LM)-Graph, a weighted bipartite graph containing all vertices of G1 and G2
-            only having edges between V_g1 and V-g2 that share the same label
-            label: weight of edge, number of duos that can be preserved locally by mapping V_g1 and V_g2
-            preserved duo: child nodes of V_g2 and V_g2 match'''
-        self._labels_G1 = nx.get_node_attributes(G1, "lbl")
-        self._labels_G2 = nx.get_node_attributes(G2, "lbl")
-        self._all_attr=list(set(list(nx.get_node_attributes(G1,'lbl').values()) +list(nx.get_node_attributes(G2,'lbl').values())))
-        indices_G1=list(range(G1.order()))
-        indices_G2=list(range(G1.order(),G1.order()+G2.order()))
-        LMG=nx.Graph()
-        LMG.add_nodes_from(indices_G1)
-        LMG.add_nodes_from(indices_G2)
-        for v in range(G1.order()):
-            LMG.nodes[v]['depth']=G1.nodes[v]['depth']
-        for v in range(G2.order()):
-            LMG.nodes[indices_G2[v]]['depth']=G2.nodes[v]['depth']
-        for v1 in range(G1.order()):
-            for v2 in range(G2.order()):
-                LMG.add_edge(v1,indices_G2[v2],weight=self.edge_weight(G1,v1,G2,v2))
-        return LMG
-    
     def complete_Sols(self,G1,G2):
         '''optimizes mapping
             before this method: similarity of father to child nodes relevant
-            after: similarity also to incoporate child nodes of child nodes'''
+            after: similarity also to incoporate child nodes of child nodes
+            the unmatched nodes of every solution are matched on refinement weights, one block per label:
+            weight of (v1, v2): 1 if their fathers are matched to each other plus the number of matched child pairs'''
         Sols=self._sols
-        indices_G1=list(range(G1.order()))
-        indices_G2=list(range(G1.order(),G1.order()+G2.order()))
+        n1=G1.order()
+        n2=G2.order()
         for s,Sol in enumerate(Sols):
-            unmatched=indices_G1+indices_G2
-            matched=[]
-            for edge in Sol:
-                matched.append(edge[0])
-                matched.append(edge[1])
-                unmatched.remove(edge[0])
-                unmatched.remove(edge[1])
-            RG=nx.Graph()
-            RG.add_nodes_from(unmatched)
-            for v1 in intersection(indices_G1,unmatched):
-                for v2 in intersection(indices_G2,unmatched):
-                    if G1.nodes[v1]['lbl']!=G2.nodes[v2-G1.order()]['lbl']:
-                        edge_weight=0
-                    else:
-                        edge_weight=0.000001
-                        if len(list(G1.predecessors(v1)))==len(list(G2.predecessors(v2-G1.order())))==1:
-                            f_v1=list(G1.predecessors(v1))[0]
-                            f_v2=list(G2.predecessors(v2-G1.order()))[0]
-                            if [f_v1,indices_G2[f_v2]] in Sol:
-                                edge_weight+=1
-                        matched_sons_v1=intersection(matched,G1.neighbors(v1))
-                        matched_sons_v2=intersection(matched,G2.neighbors(v2-G1.order()))
-                        for s_v1 in matched_sons_v1:
-                            for s_v2 in matched_sons_v2:
-                                if [s_v1,indices_G2[s_v2]] in Sol:
-                                    edge_weight+=1
-                    RG.add_edge(v1,v2,weight=edge_weight)
-            #sol_add=list(nx.max_weight_matching(RG))
-            sol_add=self.matching_solver(G1,G2,RG)
-            for i,match in enumerate(sol_add):
-                sol_add[i]=sorted(match)
-            Sols[s]=Sol+sol_add
+            mapping=np.full(n1, -1, dtype=np.int64)
+            matched_G2=np.zeros(n2, dtype=bool)
+            if Sol:
+                sol_array=np.asarray(Sol, dtype=np.int64)
+                mapping[sol_array[:,0]]=sol_array[:,1]-n1
+                matched_G2[sol_array[:,1]-n1]=True
+            unmatched_G1=np.flatnonzero(mapping<0)
+            unmatched_G2=np.flatnonzero(~matched_G2)
+            if len(unmatched_G1)==0 or len(unmatched_G2)==0:
+                continue
+            #position of every node among the unmatched nodes, -1 if matched
+            pos_G1=np.full(n1, -1, dtype=np.int64)
+            pos_G1[unmatched_G1]=np.arange(len(unmatched_G1))
+            pos_G2=np.full(n2, -1, dtype=np.int64)
+            pos_G2[unmatched_G2]=np.arange(len(unmatched_G2))
+            #matched sons: a son s1 of v1 matched to s2 adds 1 to the weight of (v1, father of s2)
+            sons_G1=G1.edges[mapping[G1.edges[:,1]]>=0]
+            v1=sons_G1[:,0]
+            v2=G2.parents[mapping[sons_G1[:,1]]]
+            keep=(v2>=0) & (pos_G1[v1]>=0)
+            keep[keep]=pos_G2[v2[keep]]>=0
+            sons=sp.csr_matrix((np.ones(int(keep.sum())), (pos_G1[v1[keep]], pos_G2[v2[keep]])), shape=(len(unmatched_G1), len(unmatched_G2)))
+            mapped_father_G1=np.where(G1.parents[unmatched_G1]>=0, mapping[G1.parents[unmatched_G1]], -1)
+            father_G2=G2.parents[unmatched_G2]
+            blocks=[]
+            for U1, U2 in label_blocks(G1.labels[unmatched_G1], G2.labels[unmatched_G2]):
+                #fathers matched to each other
+                RW=(mapped_father_G1[U1][:,None]==father_G2[U2][None,:]) & (mapped_father_G1[U1][:,None]>=0)
+                RW=RW+sons[U1][:,U2].toarray()+0.000001
+                blocks.append((unmatched_G1[U1], unmatched_G2[U2], RW))
+            rows, cols = self.solve_blocks(blocks)
+            Sols[s]=Sol+[[int(r), int(c)+n1] for r, c in zip(rows, cols)]
         self._sols=Sols
             
                 
-    def init_match(self,G1,G2):
-        LMG=self.create_LM_graph(G1,G2)
-        #indices_G1=list(range(G1.order()))
-        #indices_G2=list(range(G1.order(),G1.order()+G2.order()))
-        V1_even=[]
-        V1_odd=[]
-        V2_even=[]
-        V2_odd=[]
-        for i,node in enumerate(LMG.nodes):
-            if LMG.nodes[node]['depth']%2==0:
-                if i<G1.order():
-                    V1_even.append(i)
-                else:
-                    V2_even.append(i)
-            elif i<G1.order():
-                V1_odd.append(i)
-            else:
-                V2_odd.append(i)
-        Vs=[]
-        Vs.append(V1_even+V2_even)
-        Vs.append(V1_even+V2_odd)
-        Vs.append(V1_odd+V2_even)
-        Vs.append(V1_odd+V2_odd)
+    def init_match(self,G1,G2,LM_blocks=None):
+        '''computes the initial matchings on the LM-Graph, one for each combination of depth parities of G1 and G2
+            LM_blocks: weights of the LM-Graph (see create_LM_blocks), computed if not given'''
+        if LM_blocks is None:
+            LM_blocks=self.create_LM_blocks(G1,G2)
         Sols=[]
-        for V in Vs:
-            LMG_temp=LMG.subgraph(V)
-            #sol=list(nx.max_weight_matching(LMG_temp))
-            sol=self.matching_solver(G1,G2,LMG_temp)
-            for i,match in enumerate(sol):
-                sol[i]=sorted(match)
-            Sols.append(sol)
+        for parity_G1, parity_G2 in [(0,0), (0,1), (1,0), (1,1)]:
+            blocks=[]
+            for V1, V2, W in LM_blocks:
+                keep_G1=G1.parities[V1]==parity_G1
+                keep_G2=G2.parities[V2]==parity_G2
+                blocks.append((V1[keep_G1], V2[keep_G2], W[np.ix_(keep_G1,keep_G2)]))
+            rows, cols = self.solve_blocks(blocks)
+            Sols.append([[int(r), int(c)+G1.order()] for r, c in zip(rows, cols)])
         self._sols=Sols
 
 def add_depth(G):
     '''function needed for approximation algorithm as depth of tree is crucial for creation if LM-Graph
+        depth, depth parity and parent of every node are set in one breadth first search from the root 0
         input:  G: tree in networkx format
         output: adjusted G'''
-    for node in G.nodes:
-        SP=nx.shortest_path_length(G,0)
-        G.nodes[node]['depth']=SP[node]
+    G.nodes[0]['depth']=0
+    G.nodes[0]['parity']=0
+    G.nodes[0]['parent']=-1
+    for parent, child in nx.bfs_edges(G,0):
+        depth=G.nodes[parent]['depth']+1
+        G.nodes[child]['depth']=depth
+        G.nodes[child]['parity']=depth%2
+        G.nodes[child]['parent']=parent
     return G
 
 def normalize_similarity(value, G1, G2):
     '''normalize similarity value based on the maximum number of edges of the trees G1 and G2
         input:  value: similarity value
-                G1, G2: trees of data type networkx graph
+                G1, G2: trees as Tree or networkx graph
         output: normalized similarity value'''
     edge_count_G1 = G1.number_of_edges()
     edge_count_G2 = G2.number_of_edges()
@@ -312,6 +763,31 @@ def normalize_similarity(value, G1, G2):
     return value / max(edge_count_G1,edge_count_G2)
 
 
+def import_tree(path):
+    '''reads in a tree in gml format and returns it as Tree named after its path
+        trees in the gml layout of this project are built directly from the parsed parent and label arrays'''
+    parsed = parse_gml(path)
+    if parsed is not None:
+        ids, lbls, _, sources, targets = parsed
+        n = len(ids)
+        parents = np.full(n, -1, dtype=np.int32)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        #every node but the root 0 is the target of exactly one edge
+        if (ids == list(range(n)) and len(sources) == n-1 and ((sources >= 0) & (sources < n)).all()
+                and ((targets > 0) & (targets < n)).all() and len(np.unique(targets)) == n-1):
+            parents[targets] = sources
+            try:
+                return Tree.from_labels(parents, lbls, name=path)
+            except ValueError:
+                pass
+    #e.g. bidirected trees or other gml layouts
+    return Tree.from_networkx(read_gml(path), name=path)
+
+def import_tree_coll(paths):
+    '''reads in every tree of a list of gml files once, output: list of Trees in the order of paths'''
+    return [import_tree(path) for path in paths]
+
 def import_graph_coll(path):
     '''reads in gml data and returns a list of lists of graphs''' 
     graph_coll=[]
@@ -320,16 +796,15 @@ def import_graph_coll(path):
         graph_coll.append([])
         graphdir=os.listdir(path+'/'+dire)
         for graph_file in graphdir:
-            graph_coll[-1].append(nx.readwrite.gml.read_gml(path+'/'+dire+'/'+graph_file,label='id'))
+            graph_coll[-1].append(read_gml(path+'/'+dire+'/'+graph_file))
     return graph_coll
 
 def graph_coll_edit(coll):
-    '''adds depth data to each vertex in the collection'''
+    '''adds depth data to each vertex in the collection and converts every graph once to a Tree (see as_tree)'''
     for mR in coll:
         for G in mR:
-           for node in G.nodes:
-               SP=nx.shortest_path_length(G,0)
-               G.nodes[node]['depth']=SP[node]
+            add_depth(G)
+            as_tree(G)
     return coll
 
 
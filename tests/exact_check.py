@@ -0,0 +1,110 @@
+"""
+Created on Oct 2026
+
+check of the exact edge-preservation-similarity against brute force
+"""
+
+''' This check should be run using the CLI
+    short version:  type in cmd:
+    usage: python exact_check.py [optional arguments]
+
+    optional arguments:
+        -h, --help          show this help message and exit
+        --pairs PAIRS       Number of random pairs of trees (default: 200)
+        --max_nodes NODES   Maximal number of nodes of a random tree, at most 8 (default: 7)
+        --labels LABELS     Node labels of the random trees (default: AB)
+        --solvers           backends to check (default: all available)
+        --seed SEED         Seed of the random trees (default: 0)'''
+
+import os
+import sys
+import inspect
+import random
+import argparse
+
+UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+BASE_DIR = os.path.dirname(UTILS_DIR)
+sys.path.append(BASE_DIR)
+from edge_preservation_similarity.utils import *
+from edge_preservation_similarity.compute_eps import *
+
+
+def random_tree(n, labels):
+    '''random tree with n nodes, every node is attached to a random earlier node'''
+    parents = [-1] + [random.randrange(v) for v in range(1, n)]
+    return Tree.from_labels(parents, [random.choice(labels) for _ in range(n)])
+
+
+def brute_force_similarity(G1, G2):
+    '''edge preservation similarity by enumerating every injective label preserving partial mapping of G1 to G2'''
+    edges = G1.edges.tolist()
+    labels_G1 = G1.labels.tolist()
+    labels_G2 = G2.labels.tolist()
+    parents_G2 = G2.parents.tolist()
+    mapping = [-1]*G1.order()
+    used = [False]*G2.order()
+    best = 0
+
+    def extend(v):
+        nonlocal best
+        if v == G1.order():
+            best = max(best, sum(1 for a, b in edges if mapping[a] >= 0 and mapping[b] >= 0 and parents_G2[mapping[b]] == mapping[a]))
+            return
+        extend(v+1)
+        for w in range(G2.order()):
+            if not used[w] and labels_G1[v] == labels_G2[w]:
+                mapping[v], used[w] = w, True
+                extend(v+1)
+                mapping[v], used[w] = -1, False
+
+    extend(0)
+    return best
+
+
+def full_model_similarity(G1, G2, solver):
+    '''exact measure on the model without kernelization (see Exact_model)'''
+    GU = EXACT_SOLVERS[solver](0, kernelize=False)
+    GU.compute_duos(G1, G2)
+    return Evaluator().evaluate_sol(G1, G2, GU._sol)
+
+
+def check_exact(pairs=200, max_nodes=7, labels='AB', solvers=None, seed=0):
+    '''MAIN FUNCTION OF THE CHECK
+        compares the exact measure (kernelized, without kernelization and warm started) of every backend with brute force
+        on random trees
+
+        output: number of pairs with a different similarity for every algorithm and backend'''
+
+    if solvers is None:
+        solvers = [solver for solver in EXACT_SOLVERS if solver != 'gurobi' or gu is not None]
+    random.seed(seed)
+    algorithms = ('EDGE-PRESERVATION-SIM-EXACT', 'EDGE-PRESERVATION-SIM-EXACT-FULL-MODEL', 'EDGE-PRESERVATION-SIM-EXACT-WARM')
+    mismatches = {(algorithm, solver): 0 for algorithm in algorithms for solver in solvers}
+    for _ in range(pairs):
+        G1 = random_tree(random.randint(1, max_nodes), labels)
+        G2 = random_tree(random.randint(1, max_nodes), labels)
+        expected = brute_force_similarity(G1, G2)
+        for algorithm, solver in mismatches:
+            if algorithm == 'EDGE-PRESERVATION-SIM-EXACT-FULL-MODEL':
+                similarity = full_model_similarity(G1, G2, solver)
+            else:
+                similarity, _, _ = compute_similarity(algorithm, G1, G2, verbose=False, solver=solver)
+            if similarity != expected:
+                print(algorithm + " (" + solver + "): " + str(similarity) + " instead of " + str(expected) + " for " + str(G1.parents.tolist()) + str(G1.label_names()) + " and " + str(G2.parents.tolist()) + str(G2.label_names()))
+                mismatches[(algorithm, solver)] += 1
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check of the exact edge-preservation-similarity against brute force on random trees")
+    parser.add_argument("--pairs", default=200, type=int, help="Number of random pairs of trees (default: 200)")
+    parser.add_argument("--max_nodes", default=7, type=int, choices=range(1, 9), help="Maximal number of nodes of a random tree, at most 8 (default: 7)")
+    parser.add_argument("--labels", default="AB", type=str, help="Node labels of the random trees, one character per label (default: AB)")
+    parser.add_argument("--solvers", type=str, nargs='+', default=None, choices=EXACT_SOLVERS.keys(), help="Backends to check (default: all available)")
+    parser.add_argument("--seed", default=0, type=int, help="Seed of the random trees (default: 0)")
+    parsed_args = parser.parse_args()
+
+    mismatches = check_exact(parsed_args.pairs, parsed_args.max_nodes, parsed_args.labels, parsed_args.solvers, parsed_args.seed)
+    for (algorithm, solver), count in mismatches.items():
+        print(algorithm + " (" + solver + "): " + str(count) + " of " + str(parsed_args.pairs) + " pairs differ")
+    sys.exit(1 if any(mismatches.values()) else 0)
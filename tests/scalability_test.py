@@ -111,52 +111,48 @@ def compute_scalability(algorithm, max_n_list, input_path, output_path, jar_file
 
 
 def compute_scalability_helper(algorithm, graph_coll, times, time_limit, time_limit_gurobi, jar_file_path=''):
-    '''helper funtion for scalability tests'''
+    '''helper funtion for scalability tests
+        only the pairs above the diagonal are computed, every pair on its own (no deduplication of isomorphic trees)
+        output:     times               durations, 0.0 if the time limit was reached
+                    time_limit          whether the time limit was reached'''
 
-    for i in range(len(graph_coll)):
-        for j in range(len(graph_coll)):
-        
-            # check whether you are at a position that needs no computation and fill in a 0.0
-
-            if i >= j:
-                times[i][j] = 0.0
-                time_limit[i][j] = False
-
-            else:
+    if algorithm == 'TREE-EDIT-DIST':
+        for i in range(len(graph_coll)):
+            for j in range(len(graph_coll)):
 
-                G1=graph_coll[i][0]
-                G2=graph_coll[j][0]
+                # check whether you are at a position that needs no computation and fill in a 0.0
 
-                # compute value with algorithm
-                # if time limit is reached put 0.0 and put True in time limit matrix
-                # else put false in time limit matrix (is already by default false)
+                if i >= j:
+                    times[i][j] = 0.0
+                    time_limit[i][j] = False
 
-                tic=time.time()
+                else:
 
-                time_limit_exceeded = False
-                duration = 0.0
+                    G1=graph_coll[i][0]
+                    G2=graph_coll[j][0]
 
-                if algorithm == 'TREE-EDIT-DIST':
+                    tic=time.time()
                     test = 0
                     test = subprocess.call(['java', '-jar', jar_file_path, '-f', G1, G2, '-c', '1', '1', '1', '-s', 'left', '--switch'])
                     if test != 0:
                         print("something failed in executing tree edit dist jar file at ", i,j)
                         print("error code: ", test)
                     duration = time.time() - tic
-                else:
-                    _, duration, time_limit_exceeded = compute_similarity(algorithm, G1, G2, time_limit_gurobi, False)
+                    times[i,j] = duration
 
-                tac=time.time()
+                    print("Duration ", duration)
 
-                if time_limit_exceeded:
-                    times[i][j] = 0.0
-                    time_limit[i][j] = True
-                else:
-                    times[i,j] = duration
-                
-                print("Duration ", duration)
+        return times, time_limit
+
+    # compute value with algorithm
+    # if time limit is reached put 0.0 and put True in time limit matrix
+    _, durations, time_limit_exceeded = compute_similarity_matrix(algorithm, [graphs[0] for graphs in graph_coll], time_limit_gurobi, deduplicate=False,
+                                                                  diagonal=False, callback=lambda pair, result: print("Duration ", result[1]))
+    upper = np.triu(np.ones(times.shape, dtype=bool), k=1)
+    times[:] = np.where(upper & ~time_limit_exceeded, durations, 0.0)
+    time_limit[:] = upper & time_limit_exceeded
 
-    return times, time_limit_exceeded
+    return times, time_limit
 
 
 
@@ -237,7 +233,7 @@ def import_graph_coll_scal(path):
         print(str(dire))
         graph_coll.append([])
         print(str(path+'/'+dire+'/1.gml'))
-        graph_coll[-1].append(nx.readwrite.gml.read_gml(path+'/'+dire+'/1.gml',label='id'))
+        graph_coll[-1].append(read_gml(path+'/'+dire+'/1.gml'))
     return graph_coll
 
 
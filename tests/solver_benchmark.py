@@ -0,0 +1,95 @@
+"""
+Created on Oct 2026
+
+benchmark of the backends of the exact edge-preservation-similarity
+"""
+
+''' This benchmark should be run using the CLI
+    short version:  type in cmd:
+    usage: python solver_benchmark.py [required arguments] [optional arguments]
+
+    required arguments:
+        output_path         Path to folder where output should be saved
+
+    optional arguments:
+        -h, --help          show this help message and exit
+        --solvers           backends to compare (default: gurobi highs)
+        --blocks            tree blocks of the scalability trees to use (default: 20 40 60 80 100)
+        --time_limit LIMIT  Set time limit in seconds for every exact computation (default: 600)
+        --jobs JOBS         Number of worker processes (default: 1)'''
+
+import os
+import sys
+import inspect
+import numpy as np
+import pandas as pd
+import time
+import argparse
+
+UTILS_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+BASE_DIR = os.path.dirname(UTILS_DIR)
+sys.path.append(BASE_DIR)
+from edge_preservation_similarity.utils import *
+from edge_preservation_similarity.compute_eps import *
+
+
+def benchmark_solvers(solvers, blocks, input_path, output_path, time_limit=600, jobs=1):
+    '''MAIN FUNCTION OF THE BENCHMARK
+        computes the exact similarity of all pairs of trees (above the diagonal) of every block of the scalability trees
+        with every backend
+
+        saves:  matrices of similarity, duration and whether the time limit was reached for every block and backend (csv files)
+                summary of all blocks and backends (csv file)'''
+
+    summary = []
+    for max_n in blocks:
+        path = input_path + str(max_n)
+        graph_names_list = import_graph_names(path)
+        trees = import_tree_coll([path + '/' + name + '/1.gml' for name in graph_names_list])
+        pairs = [(i,j) for i in range(len(trees)) for j in range(i+1, len(trees))]
+
+        for solver in solvers:
+            print("block " + str(max_n) + ", solver " + str(solver) + "...")
+            first_time = time.time()
+            results = compute_similarity_pairs('EDGE-PRESERVATION-SIM-EXACT', trees, pairs, time_limit, jobs=jobs, solver=solver)
+            entire_duration = time.time() - first_time
+
+            similarity_matrix = np.zeros((len(trees),len(trees)))
+            duration_matrix = np.zeros((len(trees),len(trees)))
+            time_limit_matrix = np.zeros((len(trees),len(trees)))
+            for (i,j), (similarity, duration, time_limit_exceeded) in zip(pairs, results):
+                similarity_matrix[i,j] = similarity
+                duration_matrix[i,j] = duration
+                time_limit_matrix[i,j] = time_limit_exceeded
+
+            name = str(max_n) + '_' + str(solver)
+            for kind, matrix in (('similarity', similarity_matrix), ('duration', duration_matrix), ('time_limit_reached', time_limit_matrix)):
+                df = pd.DataFrame(data=matrix, index=graph_names_list, columns=graph_names_list)
+                df.to_csv(output_path + '/' + kind + '_' + name + '.csv')
+
+            durations = np.array([result[1] for result in results])
+            summary.append([max_n, solver, len(pairs), entire_duration, durations.mean() if len(durations) else 0.0,
+                            np.median(durations) if len(durations) else 0.0, int(sum(result[2] for result in results))])
+
+    df_summary = pd.DataFrame(summary, columns=['block', 'solver', 'pairs', 'entire duration', 'mean duration', 'median duration', 'time limit reached'])
+    df_summary.to_csv(output_path + '/solver_benchmark_summary.csv', index=False)
+    return df_summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the backends of the exact edge-preservation-similarity on the scalability trees")
+    parser.add_argument("output_path", type=str, help="Path to folder where output should be saved")
+    parser.add_argument("--solvers", type=str, nargs='+', default=list(EXACT_SOLVERS.keys()), choices=EXACT_SOLVERS.keys(), help="Backends to compare (default: all)")
+    parser.add_argument("--blocks", type=int, nargs='+', default=[20, 40, 60, 80, 100], help="Tree blocks of the scalability trees to use (default: 20 40 60 80 100)")
+    parser.add_argument("--time_limit", default=600, dest="limit", type=int, help="Set time limit in seconds for every exact computation (default: 600)")
+    parser.add_argument("--jobs", default=1, type=int, help="Number of worker processes (default: 1)")
+    parsed_args = parser.parse_args()
+
+    helper_gml_path = os.path.normpath("final_results_data/data/scalability_trees/tree_blocks_gml/")
+    gml_path = os.path.abspath(helper_gml_path) + "/"
+
+    summary = benchmark_solvers(parsed_args.solvers, parsed_args.blocks, gml_path, parsed_args.output_path, parsed_args.limit, parsed_args.jobs)
+
+    print("Benchmark done!")
+    print("Results saved to: " + str(parsed_args.output_path))
+    print(summary)
@@ -114,26 +114,32 @@ def compute_similarity_helper(algorithm, graph_coll, similarity_matrix, jar_file
                     sim_list            list of all flattened similarity values for approximation ratio'''
     
     sim_list = []
+    if algorithm != 'TREE-EDIT-DIST':
+        #the similarities of every tree to every tree are computed in one batch, block (i, j) holds the trees of groups i and j
+        trees = [G for group in graph_coll for G in group]
+        offsets = np.cumsum([0] + [len(group) for group in graph_coll])
+        all_sim_values, _, _ = compute_similarity_many_to_many(algorithm, trees, trees, normalize=True)
+
     for i in range(len(graph_coll)):
         for j in range(len(graph_coll)):
 
             if i <= j:
                 # above diagonal of matrix    
 
-                sim_values = np.zeros((len(graph_coll[i]),len(graph_coll[j])))
-                for ii in range(len(graph_coll[i])):
-                    for jj in range(len(graph_coll[j])):
-                        
-                        G1 = graph_coll[i][ii]
-                        G2 = graph_coll[j][jj]
+                if algorithm == 'TREE-EDIT-DIST':
+                    sim_values = np.zeros((len(graph_coll[i]),len(graph_coll[j])))
+                    for ii in range(len(graph_coll[i])):
+                        for jj in range(len(graph_coll[j])):
+                            
+                            G1 = graph_coll[i][ii]
+                            G2 = graph_coll[j][jj]
 
-                        if algorithm == 'TREE-EDIT-DIST':
                             sim_values[ii,jj] = 0
                             sim_values[ii,jj] = str(subprocess.check_output(['java', '-jar', 'RTED_v1.2.jar', '-f', G1, G2, '-c', '1', '1', '1', '-s', 'left', '--switch']))[2:-3]
-                            similarity = np.min(sim_values)
-                        else:
-                            sim_values[ii,jj], _, _ = compute_similarity(algorithm, G1, G2, normalize=True)
-                            similarity = np.max(sim_values)
+                    similarity = np.min(sim_values)
+                else:
+                    sim_values = all_sim_values[offsets[i]:offsets[i+1], offsets[j]:offsets[j+1]]
+                    similarity = np.max(sim_values)
 
                 print("similarity: ",similarity)
                 sim_list.extend(list(sim_values.flatten()))
@@ -151,14 +157,7 @@ def compute_similarity_helper(algorithm, graph_coll, similarity_matrix, jar_file
 
                 if algorithm != 'TREE-EDIT-DIST':
                     
-                    sim_values = np.zeros((len(graph_coll[i]),len(graph_coll[j])))
-                    for ii in range(len(graph_coll[i])):
-                        for jj in range(len(graph_coll[j])):
-                            
-                            G1 = graph_coll[i][ii]
-                            G2 = graph_coll[j][jj]
-
-                            sim_values[ii,jj], _, _ = compute_similarity(algorithm, G1, G2, normalize=True)
+                    sim_values = all_sim_values[offsets[i]:offsets[i+1], offsets[j]:offsets[j+1]]
                     similarity = np.max(sim_values)
                     sim_list.extend(list(sim_values.flatten()))
 